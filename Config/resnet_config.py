@@ -6,4 +6,31 @@ config = {
     "lr": 1e-3,
     "img_size": 224,
     "dataset": "cifar100",
+    # 実行環境 (None は自動設定)
+    "device": "auto",
+    "amp": True,
+    "amp_dtype": None,
+    "channels_last": False,
+    "compile": False,
+    "num_threads": None,
+    "num_interop_threads": None,
+    "num_workers": None,
+    "pin_memory": None,
+    # 前処理(リサイズ)済みの画像をキャッシュして使う
+    "dataset_cache": False,
+    "dataset_cache_dir": "./data/cache",
+    # チェックポイント (ckpt_interval エポックごと，最新 ckpt_keep_last 件と ckpt_metric が最良の ckpt_keep_best 件を残す)
+    "ckpt_interval": 1,
+    "ckpt_keep_last": 3,
+    "ckpt_keep_best": 1,
+    "ckpt_metric": "Val Acc",
+    "ckpt_mode": "max",
+    "stream": False,
+    "log_iterations": True,
+    "log_interval": 50,
+    "log_flush_interval": 5.0,
+    "log_flush_rows": 1000,
+    "log_binary": False,
+    "profile": False,
+    "profile_steps": None,
 }
\ No newline at end of file
@@ -0,0 +1,244 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import itertools
+import subprocess
+import tracemalloc
+from datetime import datetime
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gen_logs import generate, append_log, metric_names
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def max_rss_mb(who='self'):
+    # who='children' は終了済みの子プロセスのうち最大のもの
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_CHILDREN if who == 'children' else resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if sys.platform == 'darwin' else rss / 2**10
+
+
+class Bench:
+    # GUI を offscreen で動かして操作ごとの時間を測る (--memory のときは tracemalloc のピークメモリも)
+    def __init__(self, app, out_dir):
+        from PyQt5.QtWidgets import QFileDialog, QMessageBox
+        import plot_gui_graph
+
+        self.app = app
+        self.out_dir = out_dir
+        self.paths = []
+        self.results = []
+        # ダイアログは開かずに決まった値を返す
+        QFileDialog.getOpenFileNames = staticmethod(lambda *a, **k: (self.paths, ''))
+        QFileDialog.getExistingDirectory = staticmethod(lambda *a, **k: self.out_dir)
+        for name in ('information', 'warning', 'critical'):
+            setattr(QMessageBox, name, staticmethod(lambda *a, **k: None))
+        self.window = plot_gui_graph.LearningCurvePlotter()
+        # 小さいログもキャッシュして，load_logs_warm が常にキャッシュからの読み込みになるようにする
+        self.window.cache.min_bytes = 0
+        self.window.show()
+
+    def wait_until(self, done, timeout=600):
+        # 非同期の処理 (読み込み・保存) が終わるまでイベントを回す
+        end = time.perf_counter() + timeout
+        while not done():
+            if time.perf_counter() > end:
+                raise TimeoutError
+            self.app.processEvents()
+            time.sleep(0.001)
+
+    def measure(self, scenario, operation, func, children=False):
+        # tracemalloc は時間を大きく伸ばすため --memory のときだけ有効 (無効なら peak_mb は null)
+        # children=True は子プロセスで動く処理．このプロセスの tracemalloc では測れないので
+        # peak_mb は null にし，子プロセスの最大RSSを child_max_rss_mb に記録する
+        traced = tracemalloc.is_tracing() and not children
+        if traced:
+            tracemalloc.reset_peak()
+            start_mem = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        func()
+        seconds = time.perf_counter() - t0
+        peak = (tracemalloc.get_traced_memory()[1] - start_mem) / 2**20 if traced else None
+        result = {**scenario, 'operation': operation, 'seconds': seconds, 'peak_mb': peak}
+        if children:
+            result['child_max_rss_mb'] = max_rss_mb('children')
+        self.results.append(result)
+        memory = ''
+        if peak is not None:
+            memory = f"{peak:9.1f} MB"
+        elif children and result['child_max_rss_mb'] is not None:
+            memory = f"{result['child_max_rss_mb']:9.1f} MB (child RSS)"
+        print(f"  {operation:<20s} {seconds:9.4f} s  {memory}", flush=True)
+        return result
+
+    def draw(self):
+        canvas = self.window.current_canvas()
+        if canvas is not None:
+            canvas.draw()
+
+    def load(self):
+        w = self.window
+        w.load_logs()
+        self.wait_until(lambda: w.loader is None)
+
+    def plot(self):
+        w = self.window
+        w.select_all_metrics()
+        w.plot_selected()
+        self.draw()
+
+    def plot_combined(self):
+        from matplotlib.figure import Figure
+        import plot_core
+
+        w = self.window
+        fig = Figure(figsize=plot_core.FIG_SIZE)
+        ax = fig.subplots()
+        connected = {}
+        for metric in w.metrics:
+            plot_core.plot_combined(ax, w.logs, metric, w.color_map, connected=connected)
+
+    def file_changed(self, path):
+        w = self.window
+        w.on_file_changed(path)
+        w.redraw_timer.stop()
+        w.refresh_plots()
+        self.draw()
+
+    def save(self):
+        w = self.window
+        w.save_plot()
+        self.wait_until(lambda: w.exporter is None)
+
+    def run(self, scenario, paths, n_metrics, append_rows, append_steps):
+        w = self.window
+        self.paths = paths
+        w.cb_connect.setChecked(False)
+        w.cache.invalidate()
+        self.measure(scenario, 'load_logs_cold', self.load)
+        self.measure(scenario, 'load_logs_warm', self.load)
+        self.measure(scenario, 'plot_selected', self.plot)
+        if len(paths) >= 2:
+            self.measure(scenario, 'plot_combined', self.plot_combined)
+            w.cb_connect.setChecked(True)
+            self.measure(scenario, 'plot_selected_conn', self.plot)
+            w.cb_connect.setChecked(False)
+            self.plot()
+        # 学習中の追記: 1ファイルに append_rows 行ずつ追記し，変更通知から再描画までを測る (追記自体は含めない)
+        start = scenario['rows']
+        for step in range(append_steps):
+            append_log(paths[-1], start, append_rows, n_metrics)
+            self.measure({**scenario, 'step': step}, 'on_file_changed', lambda: self.file_changed(paths[-1]))
+            start += append_rows
+        self.measure(scenario, 'save_plot', self.save, children=True)
+
+
+def parse_list(text):
+    return [int(float(v)) for v in text.split(',')]
+
+
+def compare(old_path, results, memory):
+    # 前回の結果と操作ごとに比較する (比 = 今回 / 前回)
+    with open(old_path, encoding='utf-8') as f:
+        old = json.load(f)
+    key = lambda r: (r['rows'], r['files'], r['metrics'], r['operation'], r.get('step'))
+    before = {key(r): r for r in old['results']}
+    print(f"\ncompare with {old_path} ({old.get('commit')})")
+    if old.get('args', {}).get('memory', False) != memory:
+        print("  warning: --memory の有無が異なるため時間は比較できません")
+    for r in results:
+        b = before.get(key(r))
+        if b is not None and b['seconds'] > 0:
+            memory = ''
+            if r['peak_mb'] is not None and b.get('peak_mb') is not None:
+                memory = f"  {r['peak_mb'] - b['peak_mb']:+8.1f} MB"
+            print(f"  rows={r['rows']} files={r['files']} metrics={r['metrics']} {r['operation']:<20s}"
+                  f" {r['seconds'] / b['seconds']:6.2f}x time{memory}")
+
+
+def main(args):
+    from PyQt5.QtWidgets import QApplication
+
+    data_dir = args.data or os.path.join(tempfile.gettempdir(), 'gui_graph_bench')
+    out_dir = tempfile.mkdtemp(prefix='gui_graph_bench_out')
+    # キャッシュは実行ごとに別の場所に作る (既存のキャッシュを汚さない)
+    cache_dir = tempfile.mkdtemp(prefix='gui_graph_bench_cache')
+    os.environ['GUI_GRAPH_CACHE'] = cache_dir
+    app = QApplication([])
+    if args.memory:
+        tracemalloc.start()
+    bench = Bench(app, out_dir)
+    started = time.time()
+    try:
+        for rows, files, n_metrics in itertools.product(args.rows, args.files, args.metrics):
+            scenario = {'rows': rows, 'files': files, 'metrics': n_metrics}
+            print(f"rows={rows} files={files} metrics={n_metrics} ({', '.join(metric_names(n_metrics))})", flush=True)
+            # 追記するので毎回作り直したコピーを使う
+            source = generate(data_dir, files, rows, n_metrics)
+            work = os.path.join(out_dir, 'logs')
+            shutil.rmtree(work, ignore_errors=True)
+            os.makedirs(work)
+            paths = [shutil.copy(p, work) for p in source]
+            bench.run(scenario, paths, n_metrics, args.append_rows, args.append_steps)
+    finally:
+        tracemalloc.stop()
+        shutil.rmtree(out_dir, ignore_errors=True)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    commit = git_commit()
+    output = args.output or os.path.join(
+        ROOT, 'benchmarks', 'results', f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{commit or 'nogit'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'commit': commit,
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'total_seconds': time.time() - started,
+            'max_rss_mb': max_rss_mb(),
+            'args': vars(args),
+            'results': bench.results,
+        }, f, ensure_ascii=False, indent=1)
+    print(f"Results: {output}")
+    if args.compare:
+        compare(args.compare, bench.results, args.memory)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=parse_list, default=[1_000, 100_000], help="行数 (カンマ区切り，例: 1e3,1e5,1e7)")
+    parser.add_argument('--files', type=parse_list, default=[1, 4], help="ファイル数 (カンマ区切り)")
+    parser.add_argument('--metrics', type=parse_list, default=[2], help="メトリクス数 (カンマ区切り)")
+    parser.add_argument('--append-rows', type=int, default=1000, help="1回に追記する行数")
+    parser.add_argument('--append-steps', type=int, default=3, help="追記の回数")
+    parser.add_argument('--data', type=str, default=None, help="合成ログの保存先 (既定: 一時ディレクトリ，同じ条件なら再利用)")
+    parser.add_argument('--output', type=str, default=None, help="結果のJSON (既定: benchmarks/results/<日時>_<commit>.json)")
+    parser.add_argument('--memory', action='store_true', help="tracemalloc でピークメモリも測る (時間は遅くなる)")
+    parser.add_argument('--compare', type=str, default=None, help="比較する前回の結果のJSON")
+    args = parser.parse_args()
+    main(args)
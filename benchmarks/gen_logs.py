@@ -0,0 +1,74 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+# README の形式 (epoch, train_*, val_*) の合成ログを作る
+BASE_METRICS = ['loss', 'acc', 'cls_loss', 'reg_loss']
+CHUNK_ROWS = 1_000_000
+
+
+def metric_names(n_metrics):
+    return (BASE_METRICS + [f"metric{i}" for i in range(len(BASE_METRICS), n_metrics)])[:n_metrics]
+
+
+def make_rows(start, n, n_metrics, total, rng):
+    # 損失は減少，精度 (acc) は増加する曲線にノイズを加える
+    t = np.arange(start, start + n, dtype=np.float64)
+    progress = t / max(total, 1)
+    data = {'epoch': t.astype(np.int64)}
+    for name in metric_names(n_metrics):
+        for prefix, offset in (('train', 0.0), ('val', 0.05)):
+            if 'acc' in name:
+                y = 1.0 - np.exp(-4 * progress) * 0.9 - offset
+            else:
+                y = np.exp(-4 * progress) * 2.0 + offset
+            data[f"{prefix}_{name}"] = y + rng.normal(scale=0.02, size=n)
+    return pd.DataFrame(data)
+
+
+def write_log(path, rows, n_metrics, seed=0, total=None):
+    rng = np.random.default_rng(seed)
+    total = total or rows
+    # 大きな行数でもメモリに載る量ずつ書き出す (0行ならヘッダーのみ)
+    for start in range(0, max(rows, 1), CHUNK_ROWS):
+        n = min(CHUNK_ROWS, rows - start)
+        make_rows(start, n, n_metrics, total, rng).to_csv(
+            path, mode='w' if start == 0 else 'a', header=start == 0, index=False, float_format='%.6f'
+        )
+
+
+def append_log(path, start, rows, n_metrics, seed=0, total=None):
+    # 学習中の追記を模して start 行目から rows 行を書き足す
+    rng = np.random.default_rng(seed + start)
+    make_rows(start, rows, n_metrics, total or start + rows, rng).to_csv(
+        path, mode='a', header=False, index=False, float_format='%.6f'
+    )
+
+
+def generate(directory, files, rows, n_metrics, seed=0):
+    # 既に同じ条件で作ったファイルがあれば作り直さない
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(files):
+        path = os.path.join(directory, f"rows{rows}_metrics{n_metrics}_{i}.csv")
+        if not os.path.exists(path):
+            tmp = path + '.tmp'
+            write_log(tmp, rows, n_metrics, seed + i)
+            os.replace(tmp, path)
+        paths.append(path)
+    return paths
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--out', type=str, default='benchmarks/data', help="出力先ディレクトリ")
+    parser.add_argument('--files', type=int, default=2, help="ファイル数")
+    parser.add_argument('--rows', type=int, default=100_000, help="1ファイルの行数")
+    parser.add_argument('--metrics', type=int, default=2, help="メトリクス数 (train_/val_ の組の数)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for path in generate(args.out, args.files, args.rows, args.metrics, args.seed):
+        print(path)
@@ -0,0 +1,129 @@
+import os
+import json
+import queue
+import threading
+
+import torch
+
+
+INDEX_NAME = 'checkpoints.json'
+
+
+def to_cpu(obj):
+    # state_dict などをCPU上のコピーにする (学習を続けても書き込み中の値が変わらないように)
+    if isinstance(obj, torch.Tensor):
+        return obj.detach().to('cpu', copy=True)
+    if isinstance(obj, dict):
+        return {k: to_cpu(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(to_cpu(v) for v in obj)
+    return obj
+
+
+def read_index(directory):
+    try:
+        with open(os.path.join(directory, INDEX_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def latest_checkpoint(directory):
+    # 最後に書き終えたチェックポイントのパス (なければ None)
+    entries = [e for e in read_index(directory) if os.path.exists(os.path.join(directory, e['file']))]
+    if not entries:
+        return None
+    return os.path.join(directory, max(entries, key=lambda e: e['epoch'])['file'])
+
+
+def load_latest(directory, map_location='cpu'):
+    path = latest_checkpoint(directory)
+    if path is None:
+        return None
+    return torch.load(path, map_location=map_location, weights_only=False)
+
+
+class CheckpointWriter:
+    # チェックポイントを別スレッドで書き出す
+    # save() はCPUへのコピーだけ行ってすぐ戻る．書き込みは一時ファイルに書いてから置き換える
+    # 最新 keep_last 件と metric が良い順に keep_best 件を残し，それ以外は削除する
+    def __init__(self, directory, keep_last=3, keep_best=1, metric='Val Acc', mode='max', max_pending=1):
+        self.directory = directory
+        self.keep_last = max(1, keep_last)
+        self.keep_best = keep_best
+        self.metric = metric
+        self.mode = mode
+        self.entries = read_index(directory)
+        self.error = None
+        os.makedirs(directory, exist_ok=True)
+        # 書き込み待ちは max_pending 件まで (それ以上はコピーを溜めずに save() で待つ)
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def save(self, epoch, state, metrics=None):
+        self._raise()
+        self.queue.put((epoch, to_cpu(state), dict(metrics or {})))
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                if self.error is None:
+                    self._write(*item)
+            except Exception as e:
+                self.error = e
+            finally:
+                self.queue.task_done()
+
+    def _write(self, epoch, state, metrics):
+        name = f"{epoch + 1}.tar"
+        path = os.path.join(self.directory, name)
+        tmp = path + '.tmp'
+        torch.save(state, tmp)
+        os.replace(tmp, path)
+        self.entries = [e for e in self.entries if e['file'] != name]
+        self.entries.append({'epoch': epoch, 'file': name, 'metric': metrics.get(self.metric)})
+        self._retain()
+
+    def _retain(self):
+        by_epoch = sorted(self.entries, key=lambda e: e['epoch'])
+        keep = {e['file'] for e in by_epoch[-self.keep_last:]}
+        if self.keep_best:
+            scored = [e for e in self.entries if e['metric'] is not None]
+            scored.sort(key=lambda e: e['metric'], reverse=self.mode == 'max')
+            keep.update(e['file'] for e in scored[:self.keep_best])
+        for e in self.entries:
+            if e['file'] not in keep:
+                try:
+                    os.remove(os.path.join(self.directory, e['file']))
+                except OSError:
+                    pass
+        self.entries = [e for e in by_epoch if e['file'] in keep]
+        tmp = os.path.join(self.directory, INDEX_NAME + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, os.path.join(self.directory, INDEX_NAME))
+
+    def best(self):
+        scored = [e for e in self.entries if e['metric'] is not None]
+        if not scored:
+            return None
+        pick = max if self.mode == 'max' else min
+        return os.path.join(self.directory, pick(scored, key=lambda e: e['metric'])['file'])
+
+    def _raise(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def wait(self):
+        self.queue.join()
+        self._raise()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        self._raise()
@@ -0,0 +1,101 @@
+import os
+import json
+import numpy as np
+
+import torch
+import torch.nn.functional as F
+import torchvision
+
+
+DATASETS = {
+    'cifar10': torchvision.datasets.CIFAR10,
+    'cifar100': torchvision.datasets.CIFAR100,
+}
+
+
+def cache_paths(cache_dir, dataset_name, train, img_size):
+    # キーはデータセット名・train/test・画像サイズ
+    base = os.path.join(cache_dir, f"{dataset_name}_{'train' if train else 'test'}_{img_size}")
+    return base + '.u8', base + '.labels.npy', base + '.json'
+
+
+def resize_uint8(images, img_size):
+    # (N, H, W, C) uint8 → (N, C, img_size, img_size) uint8 (Resize と同じ bilinear + antialias)
+    x = torch.from_numpy(images).permute(0, 3, 1, 2)
+    if x.shape[-1] == img_size and x.shape[-2] == img_size:
+        return x.contiguous()
+    x = F.interpolate(x.float(), size=(img_size, img_size), mode='bilinear', antialias=True, align_corners=False)
+    return x.round_().clamp_(0, 255).to(torch.uint8)
+
+
+def build_cache(dataset_name, train, img_size, root='./data', cache_dir='./data/cache', chunk=1000, download=True):
+    # 前処理(リサイズ)済みの画像を uint8 の連続配列として1回だけ書き出す
+    data_path, label_path, meta_path = cache_paths(cache_dir, dataset_name, train, img_size)
+    source = DATASETS[dataset_name](root, train=train, download=download)
+    images = source.data
+    labels = np.asarray(source.targets, dtype=np.int64)
+    shape = (len(images), 3, img_size, img_size)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f"{data_path}.tmp{os.getpid()}"
+    out = np.memmap(tmp, dtype=np.uint8, mode='w+', shape=shape)
+    for i in range(0, len(images), chunk):
+        out[i:i + chunk] = resize_uint8(images[i:i + chunk], img_size).numpy()
+    out.flush()
+    del out
+    os.replace(tmp, data_path)
+    np.save(label_path, labels)
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump({'shape': shape, 'classes': source.classes}, f, ensure_ascii=False)
+
+
+class CachedDataset(torch.utils.data.Dataset):
+    # 前処理済みキャッシュをメモリマップで開くデータセット
+    # インデックスのリストを渡すとバッチ単位で (uint8 画像, ラベル) を返す (BatchSampler と組み合わせて使う)
+    def __init__(self, dataset_name, train, img_size, root='./data', cache_dir='./data/cache', download=True):
+        data_path, label_path, meta_path = cache_paths(cache_dir, dataset_name, train, img_size)
+        if not os.path.exists(meta_path):
+            build_cache(dataset_name, train, img_size, root, cache_dir, download=download)
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        self.data_path = data_path
+        self.shape = tuple(meta['shape'])
+        self.classes = meta['classes']
+        self.labels = torch.from_numpy(np.load(label_path))
+        self.data = None
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, index):
+        # メモリマップはワーカープロセスごとに開く
+        if self.data is None:
+            self.data = np.memmap(self.data_path, dtype=np.uint8, mode='r', shape=self.shape)
+        if isinstance(index, (list, tuple)):
+            index = np.sort(np.asarray(index))
+        return torch.from_numpy(np.ascontiguousarray(self.data[index])), self.labels[index]
+
+
+def batch_loader(dataset, batch_size, shuffle, drop_last, **kwargs):
+    # 1回の読み出しで1バッチ分を取り出す DataLoader (collate なし)
+    sampler = torch.utils.data.RandomSampler(dataset) if shuffle else torch.utils.data.SequentialSampler(dataset)
+    batches = torch.utils.data.BatchSampler(sampler, batch_size, drop_last)
+    return torch.utils.data.DataLoader(dataset, sampler=batches, batch_size=None, **kwargs)
+
+
+class BatchTransform:
+    # デバイス上でバッチ全体にまとめてかける変換 (uint8 → float，左右反転，正規化)
+    def __init__(self, mean, std, flip=False):
+        self.mean = torch.tensor(mean).view(1, -1, 1, 1)
+        self.std = torch.tensor(std).view(1, -1, 1, 1)
+        self.flip = flip
+
+    def __call__(self, img):
+        if self.mean.device != img.device:
+            self.mean = self.mean.to(img.device)
+            self.std = self.std.to(img.device)
+        img = img.float().div_(255)
+        if self.flip:
+            mask = torch.rand(img.shape[0], 1, 1, 1, device=img.device) < 0.5
+            img = torch.where(mask, img.flip(-1), img)
+        return img.sub_(self.mean).div_(self.std)
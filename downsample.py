@@ -0,0 +1,96 @@
+import warnings
+import numpy as np
+
+
+def visible_range(x, xmin, xmax):
+    # 表示範囲 [xmin, xmax] の両端を1点ずつはみ出すインデックス範囲 (x は昇順)
+    lo = max(int(np.searchsorted(x, xmin, side='left')) - 1, 0)
+    hi = min(int(np.searchsorted(x, xmax, side='right')) + 1, len(x))
+    return lo, hi
+
+
+def minmax_downsample(x, y, n_buckets):
+    # x 方向の等幅バケット (≒1ピクセル) ごとに最小値と最大値の2点を残す
+    n = len(y)
+    if n <= 2 * n_buckets + 2:
+        return x, y
+    edges = np.linspace(x[0], x[-1], n_buckets + 1)
+    starts = np.searchsorted(x, edges[:-1], side='left')
+    starts = np.unique(starts[starts < n])
+    bucket = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, n)))
+
+    with np.errstate(invalid='ignore'):
+        lo = np.fmin.reduceat(y, starts)
+        hi = np.fmax.reduceat(y, starts)
+    # 各バケットで最小値・最大値を最初にとる位置
+    i_lo = np.flatnonzero(y == lo[bucket])
+    i_lo = i_lo[np.unique(bucket[i_lo], return_index=True)[1]]
+    i_hi = np.flatnonzero(y == hi[bucket])
+    i_hi = i_hi[np.unique(bucket[i_hi], return_index=True)[1]]
+
+    idx = np.unique(np.concatenate(([0], i_lo, i_hi, [n - 1])))
+    return x[idx], y[idx]
+
+
+def lttb_downsample(x, y, n_out):
+    # Largest-Triangle-Three-Buckets (各バケット内の計算はベクトル化)
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return x, y
+    valid = np.isfinite(y)
+    if not valid.all():
+        x, y = x[valid], y[valid]
+        n = len(y)
+        if n <= n_out:
+            return x, y
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    xf = x.astype(np.float64)
+    yf = y.astype(np.float64)
+    # 次バケットの平均点はまとめて計算しておく
+    sums_x = np.add.reduceat(xf, edges[:-1])
+    sums_y = np.add.reduceat(yf, edges[:-1])
+    counts = np.diff(edges)
+    avg_x = np.append(sums_x / counts, xf[-1])
+    avg_y = np.append(sums_y / counts, yf[-1])
+
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0] = 0
+    idx[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        s, e = edges[i], edges[i + 1]
+        ax_, ay_ = xf[a], yf[a]
+        area = np.abs((ax_ - avg_x[i + 1]) * (yf[s:e] - ay_) - (ax_ - xf[s:e]) * (avg_y[i + 1] - ay_))
+        a = s + int(np.argmax(area))
+        idx[i + 1] = a
+    return x[idx], y[idx]
+
+
+def downsample(x, y, n_out, xlim=None, method='minmax'):
+    # 表示範囲を切り出してから n_out 点程度に間引く
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if xlim is not None and len(x):
+        lo, hi = visible_range(x, *sorted(xlim))
+        x, y = x[lo:hi], y[lo:hi]
+    if method == 'lttb':
+        return lttb_downsample(x, y, n_out)
+    return minmax_downsample(x, y, max(n_out // 2, 1))
+
+
+def band_downsample(x, low, high, n_out, xlim=None):
+    # 帯 (下限・上限) を n_out 区間程度に間引く．区間ごとに下限の最小・上限の最大をとる
+    x = np.asarray(x)
+    if xlim is not None and len(x):
+        lo, hi = visible_range(x, *sorted(xlim))
+        x, low, high = x[lo:hi], low[lo:hi], high[lo:hi]
+    if len(x) <= n_out or n_out <= 0:
+        return x, low, high
+    k = -(-len(x) // n_out)
+    pad = -len(x) % k
+    low = np.concatenate([low, np.full(pad, np.nan)]).reshape(-1, k)
+    high = np.concatenate([high, np.full(pad, np.nan)]).reshape(-1, k)
+    with warnings.catch_warnings():
+        # 全て NaN の区間は NaN のままでよい
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return x[::k], np.nanmin(low, axis=1), np.nanmax(high, axis=1)
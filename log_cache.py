@@ -0,0 +1,125 @@
+import os
+import json
+import shutil
+import hashlib
+import argparse
+import numpy as np
+
+
+class LogCache:
+    # 読み込み済みログを列ごとの .npy として保存し，次回はメモリマップで開くキャッシュ
+    # キーはパス・サイズ・更新時刻．合計サイズが max_bytes を超えると古いものから削除
+    def __init__(self, root=None, max_bytes=4 << 30, min_bytes=1 << 20):
+        self.root = root or os.environ.get(
+            'GUI_GRAPH_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'gui_graph')
+        )
+        self.max_bytes = max_bytes
+        self.min_bytes = min_bytes
+
+    def entry_dir(self, path):
+        key = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()
+        return os.path.join(self.root, key)
+
+    def load(self, path, st=None):
+        st = st or os.stat(path)
+        entry = self.entry_dir(path)
+        try:
+            with open(os.path.join(entry, 'meta.json'), encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta['size'] != st.st_size or meta['mtime_ns'] != st.st_mtime_ns:
+            return None
+        try:
+            data = {
+                c: np.load(os.path.join(entry, f"{i}.npy"), mmap_mode='r')
+                for i, c in enumerate(meta['columns'])
+            }
+        except (OSError, ValueError):
+            return None
+        # 別プロセスが書き換えている途中だと列ごとに長さが揃わないことがある
+        if any(len(v) != meta['rows'] for v in data.values()):
+            return None
+        # 最終利用時刻を更新 (削除順に使う)．キャッシュの失敗で読み込みを失敗させない
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        meta['header'] = meta['header'].encode('latin-1')
+        return meta, data
+
+    def save(self, path, st, offset, header, columns, data, rows):
+        if st.st_size < self.min_bytes:
+            return
+        entry = self.entry_dir(path)
+        tmp = f"{entry}.tmp{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        try:
+            os.makedirs(tmp)
+            for i, c in enumerate(columns):
+                np.save(os.path.join(tmp, f"{i}.npy"), np.ascontiguousarray(data[c]))
+            meta = {
+                'path': os.path.abspath(path),
+                'size': st.st_size,
+                'mtime_ns': st.st_mtime_ns,
+                'offset': offset,
+                'header': header.decode('latin-1'),
+                'columns': columns,
+                'rows': rows,
+            }
+            with open(os.path.join(tmp, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+            shutil.rmtree(entry, ignore_errors=True)
+            os.replace(tmp, entry)
+            # 他のプロセスが同時に保存・削除していても読み込みは成功させる
+            self.evict()
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def entries(self):
+        if not os.path.isdir(self.root):
+            return []
+        result = []
+        for name in os.listdir(self.root):
+            entry = os.path.join(self.root, name)
+            if not os.path.isdir(entry) or '.tmp' in name:
+                continue
+            # 走査中に他のプロセスが削除したエントリは飛ばす
+            try:
+                size = sum(e.stat().st_size for e in os.scandir(entry) if e.is_file())
+                result.append((os.stat(entry).st_mtime, size, entry))
+            except FileNotFoundError:
+                continue
+        return result
+
+    def evict(self):
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def invalidate(self, path=None):
+        # path 指定時はそのログのみ，未指定時はキャッシュ全体を削除
+        if path is not None:
+            shutil.rmtree(self.entry_dir(path), ignore_errors=True)
+        else:
+            shutil.rmtree(self.root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('paths', nargs='*', help="キャッシュを削除するログ (未指定時は全体)")
+    parser.add_argument('--clear', action='store_true', help="キャッシュを削除する")
+    args = parser.parse_args()
+
+    cache = LogCache()
+    if args.clear:
+        for p in args.paths or [None]:
+            cache.invalidate(p)
+    else:
+        entries = cache.entries()
+        print(f"{cache.root}: {len(entries)} entries, {sum(s for _, s, _ in entries) / 2**20:.1f} MiB")
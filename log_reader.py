@@ -0,0 +1,168 @@
+import io
+import os
+import numpy as np
+import pandas as pd
+
+
+class GrowableArray:
+    # 容量を倍々に確保して追記する1次元バッファ (追記は償却 O(1))
+    def __init__(self, dtype=np.float64, capacity=1024):
+        self.buf = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    @classmethod
+    def wrap(cls, array):
+        # 既存の配列 (読み取り専用のメモリマップも可) をそのまま使う．追記時にコピー
+        self = cls.__new__(cls)
+        self.buf = array
+        self.size = len(array)
+        return self
+
+    @property
+    def values(self):
+        return self.buf[:self.size]
+
+    def __len__(self):
+        return self.size
+
+    def reserve(self, n):
+        if n <= len(self.buf):
+            return
+        # 空のバッファへの最初の読み込みはちょうどの大きさで確保し，その後の追記だけ倍々にする
+        cap = n if self.size == 0 else max(len(self.buf), 1)
+        while cap < n:
+            cap *= 2
+        buf = np.empty(cap, dtype=self.buf.dtype)
+        buf[:self.size] = self.buf[:self.size]
+        self.buf = buf
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self.buf.dtype)
+        if not len(values):
+            return
+        n = self.size + len(values)
+        self.reserve(n)
+        self.buf[self.size:n] = values
+        self.size = n
+
+    def truncate(self, n=0):
+        self.size = min(self.size, n)
+
+
+class IncrementalCSVReader:
+    # 追記されていくCSVを前回の読み込み位置から差分だけ読むリーダ
+    # メトリクス列は float32，x 列 (epoch / iteration) は精度を保つため float64 で保持する
+    def __init__(self, path, cache=None, dtype=np.float32):
+        self.path = path
+        self.cache = cache
+        self.dtype = dtype
+        # version はデータが変わるたび，generation は全体を読み直すたびに増える
+        self.version = 0
+        self.generation = 0
+        self.reset()
+
+    def column_dtype(self, col):
+        return np.float64 if col.lower() in ('epoch', 'iteration') else self.dtype
+
+    def reset(self):
+        self.offset = 0
+        self.header = b''
+        self.columns = []
+        self.data = {}
+        self.rows = 0
+        # ファイルから読んだ行数 (配信で先に追加された行は rows のみに数える)
+        self.file_rows = 0
+        self.file_id = None
+
+    def _rotated(self, st):
+        # 切り詰め・置き換え・先頭の書き換えを検出
+        if self.file_id is None:
+            return False
+        if (st.st_dev, st.st_ino) != self.file_id or st.st_size < self.offset:
+            return True
+        with open(self.path, 'rb') as f:
+            return f.read(len(self.header)) != self.header
+
+    def read(self):
+        st = os.stat(self.path)
+        changed = False
+        if self._rotated(st):
+            self.reset()
+            self.generation += 1
+            self.version += 1
+            changed = True
+        cold = self.offset == 0
+        if cold and self.cache is not None and self.restore(st):
+            self.file_id = (st.st_dev, st.st_ino)
+            return True
+        self.file_id = (st.st_dev, st.st_ino)
+        if st.st_size <= self.offset:
+            return changed
+
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            chunk = f.read(st.st_size - self.offset)
+        # 書き込み途中の最終行は次回に回す
+        end = chunk.rfind(b'\n')
+        if end < 0:
+            return changed
+        chunk = chunk[:end + 1]
+
+        if not self.columns:
+            nl = chunk.find(b'\n')
+            self.header = chunk[:nl + 1]
+            self.columns = pd.read_csv(io.BytesIO(self.header), nrows=0).columns.tolist()
+            self.data = {c: GrowableArray(self.column_dtype(c)) for c in self.columns}
+            self.offset += nl + 1
+            chunk = chunk[nl + 1:]
+            changed = True
+
+        if chunk.strip():
+            df = pd.read_csv(io.BytesIO(chunk), header=None, names=self.columns,
+                             skip_blank_lines=True)
+            # 配信で受け取り済みの行は読み飛ばす
+            skip = self.rows - self.file_rows
+            self.file_rows += len(df)
+            if skip < len(df):
+                df = df.iloc[skip:]
+                for c in self.columns:
+                    values = pd.to_numeric(df[c], errors='coerce').to_numpy(dtype=self.column_dtype(c), na_value=np.nan)
+                    self.data[c].extend(values)
+                self.rows += len(df)
+                changed = True
+        self.offset += len(chunk)
+        if changed:
+            self.version += 1
+        # 先頭から全体を読んだときだけキャッシュに書き出す
+        if cold and self.cache is not None and self.columns:
+            self.cache.save(self.path, st, self.offset, self.header, self.columns,
+                            {c: self.data[c].values for c in self.columns}, self.rows)
+        return changed
+
+    def restore(self, st):
+        cached = self.cache.load(self.path, st)
+        if cached is None:
+            return False
+        meta, data = cached
+        self.offset = meta['offset']
+        self.header = meta['header']
+        self.columns = meta['columns']
+        self.data = {c: GrowableArray.wrap(data[c]) for c in self.columns}
+        self.rows = meta['rows']
+        self.file_rows = self.rows
+        self.version += 1
+        return True
+
+    def append_row(self, seq, columns, values):
+        # 配信された1行を追加する．seq が次の行番号と一致するときだけ受け付ける
+        if seq != self.rows or not self.columns:
+            return False
+        row = dict(zip(columns, values))
+        for c in self.columns:
+            self.data[c].extend([row.get(c, np.nan)])
+        self.rows += 1
+        self.version += 1
+        return True
+
+    def frame(self):
+        return pd.DataFrame({c: self.data[c].values for c in self.columns}, columns=self.columns)
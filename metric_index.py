@@ -0,0 +1,150 @@
+import numpy as np
+
+from log_reader import GrowableArray
+
+
+def split_column(col):
+    # 列名を (基本メトリクス名, 種類) に分ける．種類は train / val / plain / x
+    cl = col.lower()
+    if cl.startswith('train_'):
+        return col[6:], 'train'
+    if cl.startswith('val_'):
+        return col[4:], 'val'
+    if cl in ('epoch', 'iteration'):
+        return col, 'x'
+    return col, 'plain'
+
+
+class LogIndex:
+    # ログ1件分の「基本メトリクス名 → train/val/plain 列」の対応表
+    # 列構成が変わったときだけ作り直し，描画時は配列を直接参照する
+    def __init__(self, reader):
+        self.reader = reader
+        self.columns = None
+        self.update()
+
+    def update(self):
+        if self.columns == self.reader.columns:
+            return False
+        self.columns = list(self.reader.columns)
+        self.x_column = None
+        self.x_checked = (None, 0, True)
+        self.entries = {}
+        for col in self.columns:
+            base, kind = split_column(col)
+            if kind == 'x':
+                if self.x_column is None:
+                    self.x_column = col
+                continue
+            self.entries.setdefault(base, {}).setdefault(kind, col)
+        # train/val 列がある場合は同名の列を単独では描画しない
+        self.series_cols = {}
+        for base, entry in self.entries.items():
+            kinds = [k for k in ('train', 'val') if k in entry] or ['plain']
+            self.series_cols[base] = [(k, entry[k]) for k in kinds]
+        return True
+
+    @property
+    def metrics(self):
+        return list(self.entries)
+
+    @property
+    def rows(self):
+        return self.reader.rows
+
+    @property
+    def x(self):
+        # x 列 (Epoch / Iteration) が有限で昇順なら x 座標に使い，そうでなければ行番号
+        if self.x_column is not None:
+            x = self.reader.data[self.x_column].values
+            if self.x_ascending(x):
+                return x
+        return np.arange(self.reader.rows, dtype=np.float64)
+
+    def x_ascending(self, x):
+        # 確認済みの位置を覚えておき，追記された分だけ調べる (全体を読み直したら最初から)
+        generation, checked, ok = self.x_checked
+        if generation != self.reader.generation or checked > len(x):
+            checked, ok = 0, True
+        if ok and checked < len(x):
+            tail = x[max(checked - 1, 0):]
+            ok = bool(np.isfinite(tail).all() and (np.diff(tail) >= 0).all())
+        self.x_checked = (self.reader.generation, len(x), ok)
+        return ok
+
+    def series(self, metric):
+        # {種類: (列名, 値の配列)}
+        data = self.reader.data
+        return {k: (col, data[col].values) for k, col in self.series_cols.get(metric, [])}
+
+
+class MetricRegistry:
+    # 読み込んだ全ログで共有するメトリクス一覧
+    def __init__(self):
+        self.names = set()
+
+    def add(self, index):
+        self.names.update(index.metrics)
+
+    def clear(self):
+        self.names.clear()
+
+    @property
+    def metrics(self):
+        return sorted(self.names)
+
+
+class ConnectedSeries:
+    # ログ接続表示用に複数ログの同じ系列をつないで保持するバッファ
+    # 各ログの x は前のログの続きになるようにずらす (続きの番号から始まるログはそのまま)
+    # 最後のログが伸びただけなら，その差分を末尾に追記する
+    def __init__(self, metric, kind):
+        self.metric = metric
+        self.kind = kind
+        self.parts = []
+        self.offsets = []
+        self.shifts = []
+        self.generation = 0
+        self.x = GrowableArray(np.float64)
+        self.y = GrowableArray(np.float32)
+
+    @property
+    def boundaries(self):
+        # 2番目以降のログの開始位置 (x 座標)
+        return [float(self.x.values[i]) for i in self.offsets[1:] if i < len(self.x)]
+
+    def update(self, logs):
+        arrays = []
+        for log in logs:
+            series = log['index'].series(self.metric)
+            if self.kind in series:
+                reader = log['reader']
+                y = series[self.kind][1]
+                x = log['index'].x[:len(y)]
+                # x 列から行番号に切り替わった場合も作り直す
+                arrays.append(((id(reader), reader.generation, log['index'].x_checked[2]), x, y))
+        parts = [(key, len(y)) for key, _, y in arrays]
+        if (parts and len(parts) == len(self.parts) and parts[:-1] == self.parts[:-1]
+                and parts[-1][0] == self.parts[-1][0] and parts[-1][1] >= self.parts[-1][1]):
+            _, x, y = arrays[-1]
+            start = self.parts[-1][1]
+            self.x.extend(x[start:] + self.shifts[-1])
+            self.y.extend(y[start:])
+        else:
+            # 途中のログが変わった場合は新しいバッファに作り直す (描画中の配列は書き換えない)
+            size = max(sum(n for _, n in parts), 1)
+            self.x = GrowableArray(np.float64, capacity=size)
+            self.y = GrowableArray(np.float32, capacity=size)
+            self.offsets = []
+            self.shifts = []
+            for _, x, y in arrays:
+                shift = 0.0
+                if len(self.x) and len(x):
+                    shift = max(0.0, float(self.x.values[-1]) + 1 - float(x[0]))
+                self.offsets.append(len(self.y))
+                self.shifts.append(shift)
+                self.x.extend(x + shift)
+                self.y.extend(y)
+            self.generation += 1
+        self.parts = parts
+        return self.x.values, self.y.values
@@ -0,0 +1,158 @@
+import os
+import csv
+import json
+import time
+import numpy as np
+
+from metrics_stream import MetricsPublisher
+
+
+def binary_paths(csv_path):
+    return csv_path + '.bin', csv_path + '.bin.json'
+
+
+def to_float(v):
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def load_binary(csv_path):
+    # CSVと同じ内容の float32 バイナリをメモリマップで開く ({列名: 配列})
+    bin_path, meta_path = binary_paths(csv_path)
+    with open(meta_path, encoding='utf-8') as f:
+        columns = json.load(f)['columns']
+    rows = os.path.getsize(bin_path) // (4 * len(columns))
+    if rows == 0:
+        return {c: np.empty(0, dtype=np.float32) for c in columns}
+    data = np.memmap(bin_path, dtype=np.float32, mode='r', shape=(rows, len(columns)))
+    return {c: data[:, i] for i, c in enumerate(columns)}
+
+
+class MetricsLogger:
+    # 1ステップごとに呼んでも軽いCSVロガー
+    # 行はメモリに溜めて flush_rows 行または flush_interval 秒ごとにまとめて書き出す
+    # 新しい列が来たらヘッダーを書き換える．binary=True でCSVの隣に float32 の追記専用ファイルも書く
+    def __init__(self, csv_path, columns=None, flush_interval=5.0, flush_rows=100,
+                 binary=False, stream=False):
+        self.path = csv_path
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+        self.binary = binary
+        self.pending = []
+        self.last_flush = time.monotonic()
+
+        if os.path.exists(csv_path):
+            with open(csv_path, newline='') as f:
+                self.columns = next(csv.reader(f), [])
+            self.rows = self._count_rows()
+            self.known = set(self.columns)
+        else:
+            self.columns = []
+            self.rows = 0
+        new = [c for c in (columns or []) if c not in self.columns]
+        if new or not os.path.exists(csv_path):
+            self._rewrite(self.columns + new)
+        elif binary:
+            self._sync_binary()
+
+        # CSVに加えて行を GUI へ配信する (任意)
+        self.publisher = MetricsPublisher(csv_path) if stream else None
+
+    def _count_rows(self):
+        count = 0
+        with open(self.path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                count += chunk.count(b'\n')
+        return max(count - 1, 0)
+
+    def _read_rows(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, newline='') as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            return list(reader)
+
+    def _rewrite(self, columns, rows=None):
+        # ヘッダーを変えるときはファイルごと書き直して置き換える (読み手は全体を再読込する)
+        if rows is None:
+            rows = self._read_rows()
+        width = len(columns)
+        rows = [r + [''] * (width - len(r)) for r in rows]
+        tmp = self.path + '.tmp'
+        with open(tmp, mode='w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(rows)
+        os.replace(tmp, self.path)
+        self.columns = list(columns)
+        self.known = set(columns)
+        self.rows = len(rows)
+        if self.binary:
+            self._write_binary(rows)
+
+    def _write_binary(self, rows):
+        bin_path, meta_path = binary_paths(self.path)
+        width = len(self.columns)
+        data = np.array([[to_float(v) for v in (r + [''] * width)[:width]] for r in rows], dtype=np.float32)
+        data.reshape(len(rows), width).tofile(bin_path)
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump({'columns': self.columns, 'dtype': 'float32'}, f, ensure_ascii=False)
+
+    def _sync_binary(self):
+        bin_path, meta_path = binary_paths(self.path)
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                columns = json.load(f)['columns']
+            size = os.path.getsize(bin_path)
+        except (OSError, ValueError, KeyError):
+            columns, size = None, -1
+        if columns != self.columns or size != 4 * len(self.columns) * self.rows:
+            self._write_binary(self._read_rows())
+
+    def trim(self, column, limit):
+        # column の値が limit 以上の行を削除する (途中から再開するときに未保存のエポックの行を消す)
+        self.flush()
+        if column not in self.known:
+            return
+        i = self.columns.index(column)
+        rows = self._read_rows()
+        kept = [r for r in rows if not (i < len(r) and to_float(r[i]) >= limit)]
+        if len(kept) != len(rows):
+            self._rewrite(self.columns, kept)
+
+    def log(self, values):
+        if not self.known.issuperset(values):
+            new = [k for k in values if k not in self.known]
+            self.flush()
+            self._rewrite(self.columns + new)
+        # 新しい購読者は配信の前の行をCSVから読むので，溜めている行を先に書き出す
+        if self.publisher is not None and self.publisher.take_joined():
+            self.flush()
+        row = [values.get(c, '') for c in self.columns]
+        self.pending.append(row)
+        if self.publisher is not None:
+            self.publisher.publish(self.rows, self.columns, row)
+        self.rows += 1
+        if len(self.pending) >= self.flush_rows or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        if not self.pending:
+            return
+        with open(self.path, mode='a', newline='') as f:
+            csv.writer(f).writerows(self.pending)
+        if self.binary:
+            data = np.array([[to_float(v) for v in r] for r in self.pending], dtype=np.float32)
+            with open(binary_paths(self.path)[0], 'ab') as f:
+                f.write(data.tobytes())
+        self.pending = []
+
+    def close(self):
+        self.flush()
+        if self.publisher is not None:
+            self.publisher.close()
+            self.publisher = None
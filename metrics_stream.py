@@ -0,0 +1,149 @@
+import os
+import json
+import math
+import queue
+import socket
+import threading
+
+
+def endpoint_path(csv_path):
+    # 配信先のアドレスを書いておくファイル (CSVログの隣に置く)
+    return csv_path + '.stream'
+
+
+def read_endpoint(csv_path):
+    try:
+        with open(endpoint_path(csv_path), encoding='utf-8') as f:
+            info = json.load(f)
+        return info['host'], int(info['port'])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def encode_row(seq, columns, values):
+    # seq はCSV上の行番号 (ヘッダーを除いて0始まり)．空欄・NaN は null にする
+    row = [
+        None if v is None or v == '' or (isinstance(v, float) and math.isnan(v)) else float(v)
+        for v in values
+    ]
+    return (json.dumps({'seq': seq, 'columns': list(columns), 'row': row}) + '\n').encode('utf-8')
+
+
+def decode_row(line):
+    msg = json.loads(line)
+    values = [math.nan if v is None else v for v in msg['row']]
+    return msg['seq'], msg['columns'], values
+
+
+class ClientSender:
+    # 購読者1つ分の送信スレッド．学習側は行をキューに入れるだけで送信を待たない
+    # 受信が止まった購読者は max_pending 行溜まった時点で切断する (再接続時にCSVから補われる)
+    def __init__(self, conn, max_pending=10000, timeout=5.0):
+        self.conn = conn
+        self.conn.settimeout(timeout)
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.alive = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        try:
+            while True:
+                data = self.queue.get()
+                if data is None or not self.alive:
+                    break
+                self.conn.sendall(data)
+        except OSError:
+            pass
+        finally:
+            self.alive = False
+            self.conn.close()
+
+    def send(self, data):
+        # 送れなくなった (切断した) 場合は False
+        if not self.alive:
+            return False
+        try:
+            self.queue.put_nowait(data)
+        except queue.Full:
+            self.close()
+            return False
+        return True
+
+    def close(self, wait=0.0):
+        # wait 秒までは溜まっている行を送り切るのを待つ
+        if wait > 0 and self.alive:
+            try:
+                self.queue.put(None, timeout=wait)
+                self.thread.join(wait)
+            except queue.Full:
+                pass
+        self.alive = False
+        # 送信中で止まっているスレッドも抜けさせる
+        try:
+            self.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+
+class MetricsPublisher:
+    # 学習側: CSVに書いた行を localhost TCP で購読者 (GUI) にそのまま配信する
+    # CSVが正式な記録で，配信は遅延を減らすための補助．購読者がいなくても動作は変わらない
+    def __init__(self, csv_path, host='127.0.0.1', port=0, timeout=5.0, max_pending=10000):
+        self.csv_path = csv_path
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self.server = socket.create_server((host, port))
+        self.server.settimeout(1.0)
+        self.clients = []
+        self.joined = False
+        self.lock = threading.Lock()
+        self.closed = False
+
+        host, port = self.server.getsockname()[:2]
+        tmp = endpoint_path(csv_path) + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'host': host, 'port': port, 'pid': os.getpid()}, f)
+        os.replace(tmp, endpoint_path(csv_path))
+
+        self.thread = threading.Thread(target=self._accept, daemon=True)
+        self.thread.start()
+
+    def _accept(self):
+        while not self.closed:
+            try:
+                conn, _ = self.server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            with self.lock:
+                self.clients.append(ClientSender(conn, self.max_pending, self.timeout))
+                self.joined = True
+
+    def take_joined(self):
+        # 前回の呼び出し以降に新しい購読者が接続したか
+        with self.lock:
+            joined, self.joined = self.joined, False
+        return joined
+
+    def publish(self, seq, columns, values):
+        data = encode_row(seq, columns, values)
+        with self.lock:
+            self.clients = [c for c in self.clients if c.send(data)]
+
+    def close(self):
+        self.closed = True
+        try:
+            os.remove(endpoint_path(self.csv_path))
+        except OSError:
+            pass
+        self.server.close()
+        with self.lock:
+            for client in self.clients:
+                client.close(wait=1.0)
+            self.clients = []
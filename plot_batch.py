@@ -0,0 +1,78 @@
+import os
+import glob
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+matplotlib.use('Agg')
+
+from smoothing import METHODS, BANDS
+from plot_export import make_spec, export_spec, split_formats
+
+
+def run_name(path, root):
+    # 出力先で衝突しないよう，共通ディレクトリからの相対パスを名前にする
+    rel = os.path.relpath(os.path.splitext(path)[0], root)
+    return rel.replace(os.sep, '_').replace('/', '_')
+
+
+def render_job(paths, root, out_dir, metrics, options, base, exts, dpi=None):
+    # ワーカープロセス内で読み込みから保存まで行う (1回しか読まないのでログのキャッシュは作らない)
+    spec = make_spec(paths, [run_name(p, root) for p in paths], metrics, **options)
+    return export_spec(spec, out_dir, base, exts, dpi, use_cache=False)
+
+
+def main(args):
+    paths = sorted({p for pattern in args.pattern for p in glob.glob(pattern, recursive=True)})
+    if not paths:
+        print('No log files matched.')
+        return
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in paths])
+    paths = [os.path.abspath(p) for p in paths]
+    options = {'sep': args.sep, 'side': args.side, 'grid': args.grid, 'conn': args.connect,
+               'smoothing': (args.smooth, args.window), 'band': args.band}
+    base, exts = split_formats(args.filename, args.formats)
+
+    # --combine 時は全ログを1つの図に，それ以外はログごとに描画
+    if args.combine:
+        jobs = [(paths, args.out)]
+    else:
+        jobs = [([p], os.path.join(args.out, run_name(p, root))) for p in paths]
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as ex:
+        futures = {
+            ex.submit(render_job, job_paths, root, out_dir, args.metrics, options, base, exts, args.dpi): job_paths
+            for job_paths, out_dir in jobs
+        }
+        for done, fut in enumerate(as_completed(futures), 1):
+            try:
+                saved = fut.result()
+                print(f"[{done}/{len(jobs)}] {', '.join(saved)}")
+            except Exception as e:
+                failed += 1
+                print(f"[{done}/{len(jobs)}] failed: {', '.join(futures[fut])}: {e}")
+    print(f"Rendered {len(jobs) - failed}/{len(jobs)} jobs into {args.out}")
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('pattern', nargs='+', help="ログのglobパターン (例: 'output/*/log/log.csv')")
+    parser.add_argument('--metrics', nargs='*', default=None, help="描画するメトリクス (未指定時は全て)")
+    parser.add_argument('--sep', action='store_true', help="メトリクスごとに分割")
+    parser.add_argument('--side', action='store_true', help="横並びレイアウト")
+    parser.add_argument('--grid', action='store_true', help="グリッド表示")
+    parser.add_argument('--connect', action='store_true', help="ログ接続表示 (--combine と併用)")
+    parser.add_argument('--combine', action='store_true', help="全ログを1つの図にまとめる")
+    parser.add_argument('--smooth', choices=METHODS, default='none', help="平滑化 (ema / mean: 移動平均 / median: 移動中央値)")
+    parser.add_argument('--window', type=int, default=10, help="平滑化の窓幅")
+    parser.add_argument('--band', choices=BANDS, default=None, help="ログ間の平均と帯で描く (--combine と併用，std / minmax)")
+    parser.add_argument('--out', type=str, default='plots', help="出力先ディレクトリ")
+    parser.add_argument('--filename', type=str, default='plot.png', help="保存ファイル名")
+    parser.add_argument('--formats', nargs='*', default=[], help="追加で保存する形式 (例: pdf svg)")
+    parser.add_argument('--dpi', type=int, default=None, help="保存時の解像度 (既定: 100)")
+    parser.add_argument('--workers', type=int, default=None, help="プロセス数 (既定: CPUコア数)")
+
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,246 @@
+import numpy as np
+from matplotlib import rcParams
+
+from downsample import downsample, band_downsample
+from metric_index import MetricRegistry, ConnectedSeries
+from smoothing import SmoothedSeries, AggregateSeries, band_limits
+
+# Qt に依存しない描画処理 (GUI とバッチ描画で共用)
+LINE_STYLES = ['-', '--', ':', '-.']
+FIG_SIZE = (8, 6)
+LOD_POINTS = 4000
+# (平滑化の種類, 窓幅)
+NO_SMOOTHING = ('none', 1)
+# ログ接続表示の境界線に付ける gid (描き直すときに探す)
+BOUNDARY_GID = 'log-boundary'
+
+
+def detect_metrics(logs):
+    registry = MetricRegistry()
+    for log in logs:
+        registry.add(log['index'])
+    return registry.metrics
+
+
+def make_color_map(metrics):
+    colors = rcParams['axes.prop_cycle'].by_key()['color']
+    return {m: colors[i % len(colors)] for i, m in enumerate(metrics)}
+
+
+def plan_tabs(selected, sep=False, side=False):
+    # タブごとの (タブ名, [(グラフタイトル, [メトリクス])]) を返す
+    if side:
+        return [('横並び', [(m, [m]) for m in selected])]
+    if sep:
+        return [(m, [(m, [m])]) for m in selected]
+    loss = [m for m in selected if 'acc' not in m.lower()]
+    acc = [m for m in selected if 'acc' in m.lower()]
+    tabs = []
+    if loss:
+        tabs.append(('Loss', [('Loss', loss)]))
+    if acc:
+        tabs.append(('Accuracy', [('Accuracy', acc)]))
+    return tabs
+
+
+def connected_series(connected, metric, kind):
+    # connected: 再描画をまたいで接続済みの系列を保持する辞書 (None なら使い捨て)
+    if connected is None:
+        return ConnectedSeries(metric, kind)
+    if (metric, kind) not in connected:
+        connected[(metric, kind)] = ConnectedSeries(metric, kind)
+    return connected[(metric, kind)]
+
+
+def cached(cache, key, factory):
+    if cache is None:
+        return factory()
+    if key not in cache:
+        cache[key] = factory()
+    return cache[key]
+
+
+def smoothed(cache, key, y, version, smoothing):
+    # 平滑化した系列 (伸びた分だけ計算する)．key は系列，version は系列の作り直しを表す
+    if smoothing[0] == 'none' or smoothing[1] <= 1:
+        return y
+    return cached(cache, ('smooth', key, smoothing), lambda: SmoothedSeries(*smoothing)).update(version, y)
+
+
+def prune_smoothing(cache, keep):
+    # keep (平滑化の組の集合) 以外の平滑化・集計結果を捨てる (試した窓幅の数だけ系列のコピーが増えないように)
+    if cache is None:
+        return
+    for key in [k for k in cache if len(k) > 2 and k[0] in ('smooth', 'agg') and k[-1] not in keep]:
+        del cache[key]
+
+
+def aggregate_stats(logs, metric, kind, smoothing, cache=None):
+    # ログ間の平均・標準偏差・最小・最大 (ログの組み合わせが変わったら作り直す)
+    # 行番号で揃えて集計し，x 座標は最も長いログの x 列を使う
+    entries = []
+    longest = None
+    for log in logs:
+        series = log['index'].series(metric)
+        if kind in series:
+            reader = log['reader']
+            entries.append(((id(reader), reader.generation), series[kind][1]))
+            if longest is None or reader.rows > longest.rows:
+                longest = log['index']
+    agg = cached(cache, ('agg', metric, kind, smoothing), lambda: AggregateSeries(*smoothing))
+    stats = agg.update(entries)
+    if longest is not None:
+        stats['x'] = longest.x[:len(stats['x'])]
+    return stats
+
+
+def series_data(logs, source, connected=None):
+    # connected: 再描画をまたいで接続・平滑化・集計済みの系列を保持する辞書 (None なら使い捨て)
+    if source[0] == 'log':
+        _, idx, metric, kind, smoothing = source
+        reader = logs[idx]['reader']
+        y = logs[idx]['index'].series(metric)[kind][1]
+        y = smoothed(connected, (id(reader), metric, kind), y, reader.generation, smoothing)
+        return logs[idx]['index'].x[:len(y)], y
+    if source[0] == 'agg':
+        _, metric, kind, smoothing = source
+        stats = aggregate_stats(logs, metric, kind, smoothing, connected)
+        return stats['x'], stats['mean']
+    _, metric, kind, smoothing = source
+    series = connected_series(connected, metric, kind)
+    x, y = series.update(logs)
+    # 途中のログが変わって作り直したときは平滑化もやり直す
+    version = (tuple(series.parts[:-1]), series.parts[-1][0] if series.parts else None)
+    return x, smoothed(connected, ('conn', metric, kind), y, version, smoothing)
+
+
+def band_data(logs, source, connected=None):
+    _, metric, kind, smoothing, band = source
+    stats = aggregate_stats(logs, metric, kind, smoothing, connected)
+    return (stats['x'],) + band_limits(stats, band)
+
+
+def plain_line(ax, x, y, source, **kwargs):
+    line, = ax.plot(*downsample(x, y, LOD_POINTS), **kwargs)
+    return line
+
+
+def set_band(poly, x, low, high, n_out=LOD_POINTS, xlim=None):
+    # fill_between の帯を描き直す (NaN の位置は除く)
+    x, low, high = band_downsample(x, low, high, n_out, xlim)
+    keep = np.isfinite(low) & np.isfinite(high)
+    x, low, high = x[keep], low[keep], high[keep]
+    poly.set_verts([np.column_stack([np.concatenate([x, x[::-1]]), np.concatenate([low, high[::-1]])])])
+
+
+def band_datalim(ax, poly):
+    # relim() は帯 (Collection) を見ないので，自動スケール用に範囲を追加する
+    for path in poly.get_paths():
+        ax.update_datalim(path.vertices)
+
+
+def plain_band(ax, x, low, high, source, **kwargs):
+    poly = ax.fill_between([], [], [], **kwargs)
+    set_band(poly, x, low, high)
+    band_datalim(ax, poly)
+    ax.autoscale_view()
+    return poly
+
+
+def x_label(logs, default='Epoch'):
+    # 最初に見つかった x 列の名前 (Epoch / Iteration)
+    for log in logs:
+        if log['index'].x_column is not None:
+            return log['index'].x_column
+    return default
+
+
+def draw_metric(ax, logs, metric, color_map, add_line=plain_line, smoothing=NO_SMOOTHING, connected=None):
+    color = color_map.get(metric)
+    for idx, log in enumerate(logs):
+        style = LINE_STYLES[idx % len(LINE_STYLES)]
+        styles = {'train': style, 'val': '--', 'plain': '-'}
+        for kind, (col, y) in log['index'].series(metric).items():
+            source = ('log', idx, metric, kind, smoothing)
+            add_line(ax, *series_data(logs, source, connected), source,
+                     label=f"{log['name']}:{col}", color=color, linestyle=styles[kind])
+    ax.set_xlabel(x_label(logs))
+
+
+def draw_band(ax, logs, metric, color_map, add_line=plain_line, add_band=plain_band,
+              smoothing=NO_SMOOTHING, band='std', connected=None):
+    # 全ログの同じ系列を平均の線1本と帯1つで描く
+    color = color_map.get(metric)
+    kinds = {}
+    for log in logs:
+        for kind, (col, _) in log['index'].series(metric).items():
+            kinds.setdefault(kind, col)
+    styles = {'train': '-', 'val': '--', 'plain': '-'}
+    names = {'std': 'mean±std', 'minmax': 'mean, min-max'}
+    for kind, col in kinds.items():
+        source = ('agg', metric, kind, smoothing)
+        n = sum(kind in log['index'].series(metric) for log in logs)
+        add_line(ax, *series_data(logs, source, connected), source,
+                 label=f"{col} ({names[band]}, n={n})", color=color, linestyle=styles[kind])
+        source = ('band', metric, kind, smoothing, band)
+        add_band(ax, *band_data(logs, source, connected), source, color=color, alpha=0.2, linewidth=0)
+    ax.set_xlabel(x_label(logs))
+
+
+def boundary_positions(ax):
+    return sorted(line.get_xdata()[0] for line in ax.get_lines() if line.get_gid() == BOUNDARY_GID)
+
+
+def draw_boundaries(ax, positions):
+    # ログの境界を点線で表示 (前の境界線は消して描き直す)
+    for line in [l for l in ax.get_lines() if l.get_gid() == BOUNDARY_GID]:
+        line.remove()
+    for b in positions:
+        ax.axvline(b, color='gray', linestyle=':', linewidth=0.8, gid=BOUNDARY_GID)
+
+
+def plot_combined(ax, logs, metric, color_map, add_line=plain_line, connected=None, smoothing=NO_SMOOTHING):
+    color = color_map.get(metric)
+    # 境界の位置は接続済みの系列から取るので使い捨てでも辞書に保持する
+    connected = {} if connected is None else connected
+    available = set()
+    for log in logs:
+        available.update(log['index'].series(metric))
+    kinds = [
+        ('train', f"train_{metric}", '-'),
+        ('val', f"val_{metric}", '--'),
+    ]
+    if 'train' not in available and 'val' not in available:
+        kinds.append(('plain', metric, '-'))
+    boundaries = set(boundary_positions(ax))
+    for kind, label, style in kinds:
+        if kind in available:
+            source = ('conn', metric, kind, smoothing)
+            x, y = series_data(logs, source, connected)
+            add_line(ax, x, y, source, label=label, color=color, linestyle=style)
+            boundaries.update(connected_series(connected, metric, kind).boundaries)
+    # 同じ軸の他のメトリクスの境界とまとめて描く
+    draw_boundaries(ax, sorted(boundaries))
+    ax.set_xlabel(x_label(logs, 'Iterations'))
+
+
+def build_figure(fig, logs, panels, color_map, grid=False, conn=False, add_line=plain_line, connected=None,
+                 smoothing=NO_SMOOTHING, band=None, add_band=plain_band):
+    # band ('std' / 'minmax') を指定するとログごとの線の代わりに平均と帯で描く (ログ接続表示が優先)
+    axes = fig.subplots(1, len(panels), squeeze=False)[0]
+    for ax, (title, metrics) in zip(axes, panels):
+        for m in metrics:
+            if conn:
+                plot_combined(ax, logs, m, color_map, add_line, connected, smoothing)
+            elif band:
+                draw_band(ax, logs, m, color_map, add_line, add_band, smoothing, band, connected)
+            else:
+                draw_metric(ax, logs, m, color_map, add_line, smoothing, connected)
+        ax.set_title(title)
+        ax.grid(grid)
+        handles, labels = ax.get_legend_handles_labels()
+        if handles:
+            ax.legend(handles, labels)
+    fig.tight_layout()
+    return fig
+
@@ -0,0 +1,102 @@
+import os
+from functools import partial
+
+from matplotlib.figure import Figure
+
+from log_reader import IncrementalCSVReader
+from log_cache import LogCache
+from metric_index import LogIndex
+from downsample import downsample
+import plot_core
+
+# 画面上の図は使わず，ログのパスと描画オプション (spec) から別プロセスで図を作り直して保存する
+VECTOR_FORMATS = ('.pdf', '.svg', '.eps', '.ps')
+# ベクター形式で点数がこれより多い線・帯はラスタ画像として埋め込む
+RASTER_POINTS = 2000
+
+
+def make_spec(paths, names, selected, sep=False, side=False, grid=False, conn=False,
+              smoothing=plot_core.NO_SMOOTHING, band=None, fig_size=plot_core.FIG_SIZE):
+    # プロセス間で渡せる (pickle できる) 描画内容の記述
+    return {
+        'paths': list(paths), 'names': list(names), 'selected': list(selected) if selected else None,
+        'sep': sep, 'side': side, 'grid': grid, 'conn': conn,
+        'smoothing': tuple(smoothing), 'band': band, 'fig_size': tuple(fig_size),
+    }
+
+
+def spec_tabs(spec, selected=None):
+    return plot_core.plan_tabs(selected or spec['selected'], spec['sep'], spec['side'])
+
+
+def load_spec_logs(spec, use_cache=True):
+    # 読み込んだログは呼び出し元の保存が終われば捨てる (ワーカーを使い回してもメモリが増えないように)
+    cache = LogCache() if use_cache else None
+    logs = []
+    for path, name in zip(spec['paths'], spec['names']):
+        reader = IncrementalCSVReader(path, cache)
+        reader.read()
+        logs.append({'path': path, 'name': name, 'reader': reader, 'index': LogIndex(reader)})
+    return logs
+
+
+def export_line(ax, x, y, source, lod_points, **kwargs):
+    line, = ax.plot(*downsample(x, y, lod_points), **kwargs)
+    return line
+
+
+def rasterize_dense(fig, max_points=RASTER_POINTS):
+    # 点数の多い線・帯だけラスタ化する (ラスタ形式での保存には影響しない)
+    for ax in fig.axes:
+        for line in ax.get_lines():
+            if len(line.get_xdata()) > max_points:
+                line.set_rasterized(True)
+        for coll in ax.collections:
+            if sum(len(p.vertices) for p in coll.get_paths()) > max_points:
+                coll.set_rasterized(True)
+
+
+def export_spec(spec, directory, base, exts=('.png',), dpi=None, tabs=None, use_cache=True):
+    # spec のタブ (tabs: 番号のリスト，None なら全て) を exts の各形式で保存し，保存したパスを返す
+    # use_cache=False ではログのキャッシュ (~/.cache/gui_graph) を読み書きしない
+    logs = load_spec_logs(spec, use_cache)
+    selected = spec['selected'] or plot_core.detect_metrics(logs)
+    plan = spec_tabs(spec, selected)
+    color_map = plot_core.make_color_map(plot_core.detect_metrics(logs))
+    conn = spec['conn'] and len(logs) >= 2
+    fig_size = spec['fig_size']
+    dpi = dpi or 100
+    # 保存時の解像度に合わせて間引く (横方向のピクセル数の2倍程度)
+    lod_points = max(plot_core.LOD_POINTS, int(2 * fig_size[0] * dpi))
+    add_line = partial(export_line, lod_points=lod_points)
+    vector = any(ext.lower() in VECTOR_FORMATS for ext in exts)
+
+    os.makedirs(directory, exist_ok=True)
+    connected = {}
+    paths = []
+    for i, (title, panels) in enumerate(plan):
+        if tabs is not None and i not in tabs:
+            continue
+        fig = Figure(figsize=fig_size)
+        plot_core.build_figure(fig, logs, panels, color_map, spec['grid'], conn, add_line, connected,
+                               spec['smoothing'], spec['band'])
+        if vector:
+            rasterize_dense(fig)
+        for ext in exts:
+            path = os.path.join(directory, f"{title}_{base}{ext}")
+            fig.savefig(path, dpi=dpi)
+            paths.append(path)
+    return paths
+
+
+def split_formats(name, extra=()):
+    # "plot.png" と ["pdf", ".svg"] → ("plot", [".png", ".pdf", ".svg"])
+    base, ext = os.path.splitext(name)
+    exts = [ext or '.png']
+    for e in extra:
+        e = e.strip()
+        if e:
+            e = e if e.startswith('.') else '.' + e
+            if e not in exts:
+                exts.append(e)
+    return base, exts
@@ -1,19 +1,296 @@
 import sys
 import os
-import numpy as np
-import pandas as pd
+import shlex
+import multiprocessing as mp
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QListWidget, QListWidgetItem, QFileDialog,
-    QLabel, QLineEdit, QMessageBox, QCheckBox, QTabWidget
+    QLabel, QLineEdit, QMessageBox, QCheckBox, QTabWidget, QProgressDialog,
+    QDialog, QDialogButtonBox, QTableWidget, QTableWidgetItem, QAbstractItemView,
+    QComboBox, QSpinBox
 )
-from PyQt5.QtCore import Qt, QFileSystemWatcher
+from PyQt5.QtCore import Qt, QFileSystemWatcher, QTimer, QThread, QObject, pyqtSignal
+from PyQt5.QtNetwork import QTcpSocket, QAbstractSocket
 from matplotlib.backends.backend_qt5agg import (
     FigureCanvasQTAgg as FigureCanvas,
     NavigationToolbar2QT as NavigationToolbar
 )
 from matplotlib.figure import Figure
-from matplotlib import rcParams
+
+from log_reader import IncrementalCSVReader
+from log_cache import LogCache
+from metric_index import LogIndex, MetricRegistry
+from metrics_stream import read_endpoint, decode_row
+from downsample import downsample
+from run_catalog import RunCatalog, format_value
+from plot_export import make_spec, export_spec, load_spec_logs, split_formats
+import plot_core
+
+def read_log(path, cache=None):
+    reader = IncrementalCSVReader(path, cache)
+    reader.read()
+    return reader, LogIndex(reader)
+
+
+class LogLoader(QThread):
+    # 選択されたCSVログをUIスレッド外のスレッドプールで並列に読み込む
+    progress = pyqtSignal(int)
+    loaded = pyqtSignal(list, list)
+
+    def __init__(self, paths, cache=None, parent=None):
+        super().__init__(parent)
+        self.paths = paths
+        self.cache = cache
+        self.cancelled = False
+
+    def run(self):
+        results = [None] * len(self.paths)
+        errors = []
+        workers = max(1, min(len(self.paths), os.cpu_count() or 1, 8))
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            futures = {ex.submit(read_log, p, self.cache): i for i, p in enumerate(self.paths)}
+            for done, fut in enumerate(as_completed(futures), 1):
+                if self.cancelled:
+                    ex.shutdown(wait=False, cancel_futures=True)
+                    break
+                i = futures[fut]
+                # 1ファイルの失敗で他の読み込みを止めない
+                try:
+                    results[i] = fut.result()
+                except Exception as e:
+                    errors.append((self.paths[i], e))
+                self.progress.emit(done)
+        self.loaded.emit(results, errors)
+
+
+class ExportWorker(QThread):
+    # 表示中の図には触らず，描画内容 (spec) からタブごとに別プロセスで図を作り直して保存する
+    progress = pyqtSignal(int)
+    exported = pyqtSignal(list, list)
+
+    def __init__(self, spec, tabs, directory, base, exts, dpi, parent=None):
+        super().__init__(parent)
+        self.spec = spec
+        self.tabs = tabs
+        self.directory = directory
+        self.base = base
+        self.exts = exts
+        self.dpi = dpi
+        self.cancelled = False
+
+    def run(self):
+        paths, errors = [], []
+        workers = max(1, min(len(self.tabs), os.cpu_count() or 1, 8))
+        # タブをワーカー数の組に分け，各プロセスでログを1回だけ読む
+        groups = [list(range(len(self.tabs)))[k::workers] for k in range(workers)]
+        if workers > 1:
+            # 追記中のログでも各プロセスが同時にキャッシュを作り直さないよう，先にここで1回読んでおく
+            load_spec_logs(self.spec)
+        done = 0
+        # Qt のスレッドを持つプロセスを fork しないよう spawn で起動する
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context('spawn')) as ex:
+            futures = {
+                ex.submit(export_spec, self.spec, self.directory, self.base, self.exts, self.dpi, group): group
+                for group in groups
+            }
+            for fut in as_completed(futures):
+                if self.cancelled:
+                    ex.shutdown(wait=False, cancel_futures=True)
+                    break
+                group = futures[fut]
+                try:
+                    paths += fut.result()
+                except Exception as e:
+                    errors += [(self.tabs[i], e) for i in group]
+                done += len(group)
+                self.progress.emit(done)
+        self.exported.emit(paths, errors)
+
+
+class CatalogSearch(QThread):
+    # 実行一覧の更新 (変更されたログの読み込み) と検索を UI スレッド外で行う
+    searched = pyqtSignal(list, int, int, str)
+
+    def __init__(self, root, filters, sort, descending, parent=None):
+        super().__init__(parent)
+        self.root = root
+        self.filters = filters
+        self.sort = sort
+        self.descending = descending
+        self.cancelled = False
+
+    def run(self):
+        # SQLite の接続は作ったスレッドでしか使えないため，このスレッド内で開く
+        try:
+            catalog = RunCatalog(self.root)
+            try:
+                changed, removed = catalog.update(lambda: self.cancelled)
+                runs = catalog.query(self.filters, self.sort, self.descending)
+            finally:
+                catalog.close()
+        except Exception as e:
+            self.searched.emit([], 0, 0, str(e))
+            return
+        self.searched.emit(runs, changed, removed, '')
+
+
+class StreamSubscriber(QObject):
+    # train.py の MetricsPublisher から配信される行を受け取る
+    connected = pyqtSignal(str)
+    received = pyqtSignal(str, int, list, list)
+
+    def __init__(self, path, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.buffer = b''
+        self.socket = QTcpSocket(self)
+        self.socket.connected.connect(lambda: self.connected.emit(self.path))
+        self.socket.readyRead.connect(self.on_ready_read)
+
+    def connect_to_host(self):
+        # 配信元が見つかったときだけ接続する (切断後は再試行で呼ばれる)
+        if self.socket.state() != QAbstractSocket.UnconnectedState:
+            return
+        endpoint = read_endpoint(self.path)
+        if endpoint is None:
+            return
+        self.buffer = b''
+        self.socket.connectToHost(*endpoint)
+
+    def on_ready_read(self):
+        self.buffer += bytes(self.socket.readAll())
+        *lines, self.buffer = self.buffer.split(b'\n')
+        for line in lines:
+            try:
+                seq, columns, values = decode_row(line)
+            except (ValueError, KeyError):
+                continue
+            self.received.emit(self.path, seq, columns, values)
+
+    def close(self):
+        self.socket.abort()
+
+
+class RunCatalogDialog(QDialog):
+    # output/ 以下の実行を条件で絞り込んで選ぶダイアログ
+    def __init__(self, root='./output', parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("実行一覧から選択")
+        self.resize(900, 500)
+        self.runs = []
+        self.root = root
+        self.searcher = None
+        layout = QVBoxLayout(self)
+
+        row = QHBoxLayout()
+        row.addWidget(QLabel("フォルダ："))
+        self.edit_root = QLineEdit(root)
+        row.addWidget(self.edit_root)
+        btn_root = QPushButton("参照")
+        btn_root.clicked.connect(self.choose_root)
+        row.addWidget(btn_root)
+        layout.addLayout(row)
+
+        row = QHBoxLayout()
+        row.addWidget(QLabel("条件："))
+        self.edit_filter = QLineEdit()
+        self.edit_filter.setPlaceholderText("例: lr<=1e-3 dataset=cifar10 best_val_acc>0.5")
+        self.edit_filter.returnPressed.connect(self.search)
+        row.addWidget(self.edit_filter, stretch=3)
+        row.addWidget(QLabel("並べ替え："))
+        self.edit_sort = QLineEdit("best_val_acc")
+        row.addWidget(self.edit_sort, stretch=1)
+        self.cb_desc = QCheckBox("降順")
+        self.cb_desc.setChecked(True)
+        row.addWidget(self.cb_desc)
+        self.btn_search = QPushButton("検索")
+        self.btn_search.clicked.connect(self.search)
+        row.addWidget(self.btn_search)
+        layout.addLayout(row)
+
+        self.table = QTableWidget()
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        layout.addWidget(self.table)
+        self.label = QLabel()
+        layout.addWidget(self.label)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def choose_root(self):
+        path = QFileDialog.getExistingDirectory(self, "学習結果のフォルダを選択", self.edit_root.text())
+        if path:
+            self.edit_root.setText(path)
+            self.search()
+
+    def search(self):
+        if self.searcher is not None:
+            return
+        try:
+            filters = shlex.split(self.edit_filter.text())
+        except ValueError as e:
+            QMessageBox.warning(self, "検索エラー", str(e))
+            return
+        self.root = self.edit_root.text()
+        self.btn_search.setEnabled(False)
+        self.label.setText("実行一覧を更新しています...")
+        self.searcher = CatalogSearch(self.root, filters, self.edit_sort.text().strip() or None,
+                                      self.cb_desc.isChecked(), self)
+        self.searcher.searched.connect(self.on_searched)
+        self.searcher.start()
+
+    def on_searched(self, runs, changed, removed, error):
+        # 閉じた・止めたあとに届いた結果は捨てる
+        if self.searcher is None or self.sender() is not self.searcher:
+            return
+        self.searcher.wait()
+        self.searcher = None
+        self.btn_search.setEnabled(True)
+        if error:
+            self.label.setText("")
+            QMessageBox.warning(self, "検索エラー", error)
+            return
+        self.runs = runs
+        root = self.root
+        # 実行ごとに値が異なる Config の項目だけを列にする
+        keys = []
+        for run in self.runs:
+            keys += [k for k in run['config'] if k not in keys]
+        keys = [k for k in keys if len({repr(r['config'].get(k)) for r in self.runs}) > 1]
+        fields = ['rows', 'best_val_acc', 'last_val_acc', 'last_train_loss']
+        self.table.clear()
+        self.table.setColumnCount(1 + len(keys) + len(fields))
+        self.table.setRowCount(len(self.runs))
+        self.table.setHorizontalHeaderLabels(['run'] + keys + fields)
+        for i, run in enumerate(self.runs):
+            values = [os.path.relpath(run['run_dir'], root)]
+            values += [format_value(run['config'].get(k)) for k in keys]
+            values += [format_value(run[f]) for f in fields]
+            for j, v in enumerate(values):
+                self.table.setItem(i, j, QTableWidgetItem(v))
+        self.table.resizeColumnsToContents()
+        self.label.setText(f"{len(self.runs)} 件 (更新 {changed} 件，削除 {removed} 件)")
+
+    def done(self, result):
+        # 更新中に閉じた場合は止めてからスレッドを破棄する
+        if self.searcher is not None:
+            self.searcher.cancelled = True
+            self.searcher.wait()
+            self.searcher = None
+        super().done(result)
+
+    def selected_paths(self):
+        # 選択した行 (未選択なら一覧の全て) のログ
+        rows = sorted({index.row() for index in self.table.selectionModel().selectedRows()})
+        runs = [self.runs[i] for i in rows] if rows else self.runs
+        return [run['log_path'] for run in runs]
+
 
 class LearningCurvePlotter(QMainWindow):
     def __init__(self):
@@ -23,11 +300,42 @@ class LearningCurvePlotter(QMainWindow):
         self.logs = []
         self.metrics = []
         self.color_map = {}
-        self.line_styles = ['-', '--', ':', '-.']
-        self.fig_size = (8, 6)
+        self.loader = None
+        self.exporter = None
+        self.cache = LogCache()
+        self.registry = MetricRegistry()
+        self.fig_size = plot_core.FIG_SIZE
+        # ライブ更新用: 図ごとの描画済みの線とデータの取得元
+        self.fig_lines = {}
+        self.line_data = {}
+        # ログ間の集計の帯 (fill_between) とその元データ
+        self.fig_bands = {}
+        self.band_data = {}
+        self.fig_versions = {}
+        self.plot_columns = None
+        self.plot_options = (False, False, plot_core.NO_SMOOTHING, None)
+        self.plot_spec = None
+        self.tab_plan = []
+        # 作成済みの図の LRU キャッシュ (キー: タブ構成・オプション)
+        self.figure_cache = OrderedDict()
+        self.figure_cache_size = 16
+        # ログ接続表示用の接続済み系列 (メトリクス・種類ごと)
+        self.connected = {}
+        # 1系列あたりの最大描画点数 (間引き)
+        self.lod_points = plot_core.LOD_POINTS
 
         self.watcher = QFileSystemWatcher()
         self.watcher.fileChanged.connect(self.on_file_changed)
+        # 連続した変更通知を1回の再描画にまとめる
+        self.redraw_timer = QTimer(self)
+        self.redraw_timer.setSingleShot(True)
+        self.redraw_timer.setInterval(200)
+        self.redraw_timer.timeout.connect(self.refresh_plots)
+        # 学習側からの配信 (接続できない間は定期的に再接続を試みる)
+        self.subscribers = []
+        self.stream_timer = QTimer(self)
+        self.stream_timer.setInterval(2000)
+        self.stream_timer.timeout.connect(self.connect_streams)
 
         central = QWidget()
         self.setCentralWidget(central)
@@ -37,6 +345,7 @@ class LearningCurvePlotter(QMainWindow):
         self.left_layout = QVBoxLayout(left_widget)
         main_layout.addWidget(left_widget, stretch=3)
         self.tabs = QTabWidget()
+        self.tabs.currentChanged.connect(self.on_tab_changed)
         self.left_layout.addWidget(self.tabs)
         self.toolbar = None
 
@@ -45,9 +354,15 @@ class LearningCurvePlotter(QMainWindow):
         main_layout.addWidget(ctrl, stretch=1)
 
         # ログ読み込みボタン
-        btn_load = QPushButton("ログ読み込み")
-        btn_load.clicked.connect(self.load_logs)
-        ctrl_layout.addWidget(btn_load)
+        self.btn_load = QPushButton("ログ読み込み")
+        self.btn_load.clicked.connect(self.load_logs)
+        ctrl_layout.addWidget(self.btn_load)
+        self.btn_catalog = QPushButton("実行一覧から読み込み")
+        self.btn_catalog.clicked.connect(self.load_from_catalog)
+        ctrl_layout.addWidget(self.btn_catalog)
+        btn_cache = QPushButton("キャッシュ削除")
+        btn_cache.clicked.connect(self.clear_cache)
+        ctrl_layout.addWidget(btn_cache)
 
         # 各種オプション
         self.cb_sep = QCheckBox("メトリクスごとにタブ分割")
@@ -58,6 +373,25 @@ class LearningCurvePlotter(QMainWindow):
         ctrl_layout.addWidget(self.cb_side)
         self.cb_connect = QCheckBox("ログ接続表示 (2つ以上)")
         ctrl_layout.addWidget(self.cb_connect)
+        row = QHBoxLayout()
+        row.addWidget(QLabel("平滑化："))
+        self.combo_smooth = QComboBox()
+        for label, method in (("なし", 'none'), ("EMA", 'ema'), ("移動平均", 'mean'), ("移動中央値", 'median')):
+            self.combo_smooth.addItem(label, method)
+        row.addWidget(self.combo_smooth)
+        row.addWidget(QLabel("窓幅："))
+        self.spin_window = QSpinBox()
+        self.spin_window.setRange(1, 100000)
+        self.spin_window.setValue(10)
+        row.addWidget(self.spin_window)
+        ctrl_layout.addLayout(row)
+        row = QHBoxLayout()
+        row.addWidget(QLabel("ログ間の集計："))
+        self.combo_band = QComboBox()
+        for label, band in (("なし", None), ("平均±標準偏差", 'std'), ("平均と最小〜最大", 'minmax')):
+            self.combo_band.addItem(label, band)
+        row.addWidget(self.combo_band)
+        ctrl_layout.addLayout(row)
 
         # メトリクス選択
         ctrl_layout.addWidget(QLabel("プロットするメトリクスを選択："))
@@ -76,9 +410,20 @@ class LearningCurvePlotter(QMainWindow):
         ctrl_layout.addWidget(QLabel("保存ファイル名 (例: plot.png)："))
         self.edit_filename = QLineEdit("plot.png")
         ctrl_layout.addWidget(self.edit_filename)
-        btn_save = QPushButton("プロット保存")
-        btn_save.clicked.connect(self.save_plot)
-        ctrl_layout.addWidget(btn_save)
+        row = QHBoxLayout()
+        row.addWidget(QLabel("追加の形式："))
+        self.edit_formats = QLineEdit()
+        self.edit_formats.setPlaceholderText("例: pdf,svg")
+        row.addWidget(self.edit_formats)
+        row.addWidget(QLabel("DPI："))
+        self.spin_dpi = QSpinBox()
+        self.spin_dpi.setRange(50, 1200)
+        self.spin_dpi.setValue(100)
+        row.addWidget(self.spin_dpi)
+        ctrl_layout.addLayout(row)
+        self.btn_save = QPushButton("プロット保存")
+        self.btn_save.clicked.connect(self.save_plot)
+        ctrl_layout.addWidget(self.btn_save)
         ctrl_layout.addStretch()
 
     def load_logs(self):
@@ -87,34 +432,82 @@ class LearningCurvePlotter(QMainWindow):
         )
         if not paths:
             return
+        self.start_loading(paths)
+
+    def load_from_catalog(self):
+        dialog = RunCatalogDialog(parent=self)
+        dialog.search()
+        if dialog.exec_() != QDialog.Accepted:
+            return
+        paths = dialog.selected_paths()
+        if paths:
+            self.start_loading(paths)
+
+    def start_loading(self, paths):
+        if self.loader is not None:
+            return
+        self.btn_load.setEnabled(False)
+        self.btn_catalog.setEnabled(False)
+        self.progress_dialog = QProgressDialog("ログを読み込んでいます...", "キャンセル", 0, len(paths), self)
+        self.progress_dialog.setWindowModality(Qt.WindowModal)
+        self.progress_dialog.setMinimumDuration(0)
+        self.progress_dialog.setValue(0)
+
+        self.loader = LogLoader(paths, self.cache, self)
+        self.loader.progress.connect(self.progress_dialog.setValue)
+        self.loader.loaded.connect(self.on_logs_loaded)
+        self.progress_dialog.canceled.connect(self.cancel_loading)
+        self.loader.start()
+
+    def cancel_loading(self):
+        if self.loader is not None:
+            self.loader.cancelled = True
+
+    def on_logs_loaded(self, results, errors):
+        loader = self.loader
+        loader.wait()
+        self.loader = None
+        self.progress_dialog.close()
+        self.btn_load.setEnabled(True)
+        self.btn_catalog.setEnabled(True)
+        # キャンセル時は読み込み前の状態を維持
+        if loader.cancelled:
+            return
+
         self.logs.clear()
+        self.registry.clear()
+        self.clear_tabs()
+        self.clear_figures()
+        self.plot_spec = None
+        self.plot_columns = None
         self.watcher.removePaths(self.watcher.files())
-        for p in paths:
-            try:
-                df = pd.read_csv(p)
-            except Exception as e:
-                QMessageBox.critical(self, "エラー", f"{os.path.basename(p)} の読み込みに失敗しました：\n{e}")
+        for sub in self.subscribers:
+            sub.close()
+            sub.deleteLater()
+        self.subscribers = []
+        for p, result in zip(loader.paths, results):
+            if result is None:
                 continue
+            reader, index = result
             name = os.path.splitext(os.path.basename(p))[0]
-            self.logs.append({'path': p, 'df': df, 'name': name})
+            self.logs.append({'path': p, 'name': name, 'reader': reader, 'index': index})
+            self.registry.add(index)
             self.watcher.addPath(p)
+            sub = StreamSubscriber(p, self)
+            sub.connected.connect(self.on_file_changed)
+            sub.received.connect(self.on_stream_row)
+            self.subscribers.append(sub)
+        self.connect_streams()
+        self.stream_timer.start()
+        if errors:
+            QMessageBox.critical(
+                self, "エラー",
+                "\n".join(f"{os.path.basename(p)} の読み込みに失敗しました：\n{e}" for p, e in errors)
+            )
 
-        # メトリクス検出
-        bases = []
-        for log in self.logs:
-            for col in log['df'].columns:
-                cl = col.lower()
-                if cl.startswith('train_'):
-                    bases.append(col[6:])
-                elif cl.startswith('val_'):
-                    bases.append(col[4:])
-                elif cl != 'epoch':
-                    bases.append(col)
-        self.metrics = sorted(set(bases))
-
-        # カラーマップ設定
-        colors = rcParams['axes.prop_cycle'].by_key()['color']
-        self.color_map = {m: colors[i % len(colors)] for i, m in enumerate(self.metrics)}
+        # メトリクス検出・カラーマップ設定
+        self.metrics = self.registry.metrics
+        self.color_map = plot_core.make_color_map(self.metrics)
 
         # メトリクス一覧に反映
         self.list_widget.clear()
@@ -129,14 +522,195 @@ class LearningCurvePlotter(QMainWindow):
             f"{len(self.logs)} 件のログを読み込みました。\nメトリクス: {', '.join(self.metrics)}"
         )
 
+    def clear_cache(self):
+        self.cache.invalidate()
+        QMessageBox.information(self, "キャッシュ削除", f"キャッシュを削除しました：\n{self.cache.root}")
+
+    def read_log_file(self, log):
+        # 追記分だけ読み込む (切り詰め・置き換え時は全体を再読込)
+        try:
+            if not log['reader'].read():
+                return False
+        except Exception:
+            return False
+        if log['index'].update():
+            self.registry.add(log['index'])
+        return True
+
     def on_file_changed(self, path):
+        changed = False
         for log in self.logs:
             if log['path'] == path:
-                try:
-                    log['df'] = pd.read_csv(path)
-                except:
-                    pass
-        self.plot_selected()
+                changed |= self.read_log_file(log)
+        # ファイルが置き換えられると監視が外れるため登録し直す
+        if path not in self.watcher.files() and os.path.exists(path):
+            self.watcher.addPath(path)
+        if changed and self.tab_plan:
+            self.redraw_timer.start()
+
+    def connect_streams(self):
+        for sub in self.subscribers:
+            sub.connect_to_host()
+
+    def on_stream_row(self, path, seq, columns, values):
+        changed = False
+        for log in self.logs:
+            if log['path'] != path:
+                continue
+            reader = log['reader']
+            # 取りこぼした行や新しい列はCSVから補う
+            if seq > reader.rows or not set(columns) <= set(reader.columns):
+                changed |= self.read_log_file(log)
+            if set(columns) <= set(reader.columns):
+                changed |= reader.append_row(seq, columns, values)
+        if changed and self.tab_plan:
+            self.redraw_timer.start()
+
+    def refresh_plots(self):
+        # 列構成が変わった場合は作り直す
+        if self.plot_columns != [tuple(log['index'].columns) for log in self.logs]:
+            self.plot_selected()
+            return
+        # 表示中の図だけ更新し，他のタブは表示したときに更新する
+        canvas = self.current_canvas()
+        if canvas is not None and self.update_figure(canvas.figure):
+            canvas.draw_idle()
+
+    def data_version(self):
+        return tuple(log['reader'].version for log in self.logs)
+
+    def update_figure(self, fig):
+        # 描画済みの線にデータを流し込む (図は作り直さない)
+        version = self.data_version()
+        if self.fig_versions.get(fig) == version:
+            return False
+        self.fig_versions[fig] = version
+        axes = []
+        boundaries = {}
+        for line, source in self.fig_lines.get(fig, []):
+            self.line_data[line] = plot_core.series_data(self.logs, source, self.connected)
+            if line.axes not in axes:
+                axes.append(line.axes)
+            if source[0] == 'conn':
+                series = plot_core.connected_series(self.connected, source[1], source[2])
+                boundaries.setdefault(line.axes, set()).update(series.boundaries)
+        # 接続した系列を作り直すと境界の位置が変わるので描き直す
+        for ax, positions in boundaries.items():
+            if sorted(positions) != plot_core.boundary_positions(ax):
+                plot_core.draw_boundaries(ax, sorted(positions))
+        for poly, source in self.fig_bands.get(fig, []):
+            self.band_data[poly] = plot_core.band_data(self.logs, source, self.connected)
+        for ax in axes:
+            self.update_lod(ax, full=ax.get_autoscalex_on())
+            # ユーザーがズーム・パンした軸は表示範囲を維持する
+            if ax.get_autoscalex_on() or ax.get_autoscaley_on():
+                ax.relim()
+                for poly, _ in self.fig_bands.get(fig, []):
+                    if poly.axes is ax:
+                        plot_core.band_datalim(ax, poly)
+                ax.autoscale_view()
+        return True
+
+    def add_line(self, ax, x, y, source, **kwargs):
+        # 間引いたデータを描画し，元データは再間引き用に保持する
+        line, = ax.plot(*downsample(x, y, self.lod_points), **kwargs)
+        self.fig_lines.setdefault(ax.figure, []).append((line, source))
+        self.line_data[line] = (x, y)
+        return line
+
+    def add_band(self, ax, x, low, high, source, **kwargs):
+        poly = plot_core.plain_band(ax, x, low, high, source, **kwargs)
+        self.fig_bands.setdefault(ax.figure, []).append((poly, source))
+        self.band_data[poly] = (x, low, high)
+        return poly
+
+    def update_lod(self, ax, full=False):
+        # 表示中の x 範囲に合わせて間引き直す (ズームすると元の解像度に近づく)
+        xlim = None if full else ax.get_xlim()
+        for line in ax.get_lines():
+            if line in self.line_data:
+                x, y = self.line_data[line]
+                line.set_data(*downsample(x, y, self.lod_points, xlim=xlim))
+        for poly, _ in self.fig_bands.get(ax.figure, []):
+            if poly.axes is ax:
+                plot_core.set_band(poly, *self.band_data[poly], self.lod_points, xlim)
+
+    def current_canvas(self):
+        widget = self.tabs.currentWidget()
+        return widget.findChild(FigureCanvas) if widget is not None else None
+
+    def ensure_tab(self, index):
+        # タブを初めて表示したときに図を作る．作成済みの図は LRU キャッシュから再利用
+        key, title, panels = self.tab_plan[index]
+        tab = self.tabs.widget(index)
+        canvas = tab.findChild(FigureCanvas)
+        if canvas is None:
+            canvas = self.figure_cache.get(key)
+            if canvas is None:
+                fig = Figure(figsize=self.fig_size)
+                grid, conn, smoothing, band = self.plot_options
+                plot_core.build_figure(fig, self.logs, panels, self.color_map, grid, conn,
+                                       self.add_line, self.connected, smoothing, band, self.add_band)
+                for ax in fig.axes:
+                    ax.callbacks.connect('xlim_changed', self.update_lod)
+                self.fig_versions[fig] = self.data_version()
+                canvas = FigureCanvas(fig)
+                self.figure_cache[key] = canvas
+            tab.layout().addWidget(canvas)
+        self.figure_cache.move_to_end(key)
+        self.evict_figures(keep=canvas)
+        self.update_figure(canvas.figure)
+        return canvas
+
+    def evict_figures(self, keep=None):
+        while len(self.figure_cache) > self.figure_cache_size:
+            key, canvas = next(iter(self.figure_cache.items()))
+            if canvas is keep:
+                break
+            del self.figure_cache[key]
+            self.drop_canvas(canvas)
+
+    def drop_canvas(self, canvas):
+        fig = canvas.figure
+        for line, _ in self.fig_lines.pop(fig, []):
+            self.line_data.pop(line, None)
+        for poly, _ in self.fig_bands.pop(fig, []):
+            self.band_data.pop(poly, None)
+        self.fig_versions.pop(fig, None)
+        canvas.setParent(None)
+        canvas.deleteLater()
+
+    def clear_tabs(self):
+        # 図はキャッシュに残したまま古いタブだけ破棄する
+        # 先に tab_plan を空にする (clear() 中のタブ切り替えで古い図を更新しない)
+        pages = [self.tabs.widget(i) for i in range(self.tabs.count())]
+        self.tab_plan = []
+        self.tabs.clear()
+        for page in pages:
+            canvas = page.findChild(FigureCanvas)
+            if canvas is not None:
+                canvas.setParent(None)
+            page.deleteLater()
+        if self.toolbar:
+            self.toolbar.setParent(None)
+            self.toolbar = None
+
+    def clear_figures(self):
+        self.connected.clear()
+        for canvas in self.figure_cache.values():
+            self.drop_canvas(canvas)
+        self.figure_cache.clear()
+
+    def on_tab_changed(self, index):
+        if index < 0 or index >= len(self.tab_plan):
+            return
+        canvas = self.ensure_tab(index)
+        # ナビゲーションツールバーを表示中の図に付け替える
+        if self.toolbar:
+            self.toolbar.setParent(None)
+        self.toolbar = NavigationToolbar(canvas, self)
+        self.left_layout.insertWidget(0, self.toolbar)
+        canvas.draw_idle()
 
     def select_all_metrics(self):
         for i in range(self.list_widget.count()):
@@ -160,160 +734,77 @@ class LearningCurvePlotter(QMainWindow):
         sep = self.cb_sep.isChecked()
         conn = self.cb_connect.isChecked() and len(self.logs) >= 2
 
-        self.tabs.clear()
-        if self.toolbar:
-            self.toolbar.setParent(None)
+        columns = [tuple(log['index'].columns) for log in self.logs]
+        if self.plot_columns != columns:
+            self.clear_figures()
+        self.plot_columns = columns
+        smoothing = (self.combo_smooth.currentData(), self.spin_window.value())
+        self.plot_options = (grid, conn, smoothing, self.combo_band.currentData())
+        # 表示するタブは全て同じ平滑化なので，他の平滑化の結果は捨てる (キャッシュ中の図は表示時に計算し直す)
+        plot_core.prune_smoothing(self.connected, {smoothing})
+        # 保存用の描画内容 (別プロセスで図を作り直す)
+        self.plot_spec = make_spec(
+            [log['path'] for log in self.logs], [log['name'] for log in self.logs], selected,
+            sep, side, grid, conn, smoothing, self.combo_band.currentData(), self.fig_size
+        )
 
-        def new_fig():
-            return Figure(figsize=self.fig_size)
-
-        # 横並びレイアウト
-        if side:
-            fig = new_fig()
-            axes = fig.subplots(1, len(selected), squeeze=False)[0]
-            for ax, m in zip(axes, selected):
-                if conn and not sep:
-                    self.plot_combined(ax, m)
-                else:
-                    if conn and sep:
-                        self.plot_combined(ax, m)
-                    else:
-                        self.draw_metric(ax, m, conn)
-                ax.set_title(m)
-                ax.grid(grid)
-                handles, labels = ax.get_legend_handles_labels()
-                if handles:
-                    ax.legend(handles, labels)
-            fig.tight_layout()
-            canvas = FigureCanvas(fig)
+        # タブは空で作り，図は表示時に作る
+        current = self.tabs.currentIndex()
+        self.tabs.blockSignals(True)
+        self.clear_tabs()
+        for title, panels in plot_core.plan_tabs(selected, sep, side):
+            key = (title, tuple((t, tuple(ms)) for t, ms in panels)) + self.plot_options
+            self.tab_plan.append((key, title, panels))
             tab = QWidget()
-            layout = QVBoxLayout(tab)
-            layout.addWidget(canvas)
-            self.tabs.addTab(tab, '横並び')
-
-        # メトリクスごとタブ
-        elif sep:
-            for m in selected:
-                fig = new_fig()
-                ax = fig.add_subplot(111)
-                if conn:
-                    self.plot_combined(ax, m)
-                else:
-                    self.draw_metric(ax, m, conn)
-                ax.set_title(m)
-                ax.grid(grid)
-                handles, labels = ax.get_legend_handles_labels()
-                if handles:
-                    ax.legend(handles, labels)
-                fig.tight_layout()
-                canvas = FigureCanvas(fig)
-                tab = QWidget()
-                layout = QVBoxLayout(tab)
-                layout.addWidget(canvas)
-                self.tabs.addTab(tab, m)
-
-        # Loss & Accuracy タブ
-        else:
-            loss = [m for m in selected if 'acc' not in m.lower()]
-            acc = [m for m in selected if 'acc' in m.lower()]
-            if loss:
-                fig = new_fig()
-                ax = fig.add_subplot(111)
-                for m in loss:
-                    if conn:
-                        self.plot_combined(ax, m)
-                    else:
-                        self.draw_metric(ax, m, conn)
-                ax.set_title('Loss')
-                ax.grid(grid)
-                handles, labels = ax.get_legend_handles_labels()
-                if handles:
-                    ax.legend(handles, labels)
-                fig.tight_layout()
-                canvas = FigureCanvas(fig)
-                tab = QWidget()
-                layout = QVBoxLayout(tab)
-                layout.addWidget(canvas)
-                self.tabs.addTab(tab, 'Loss')
-            if acc:
-                fig = new_fig()
-                ax = fig.add_subplot(111)
-                for m in acc:
-                    if conn:
-                        self.plot_combined(ax, m)
-                    else:
-                        self.draw_metric(ax, m, conn)
-                ax.set_title('Accuracy')
-                ax.grid(grid)
-                handles, labels = ax.get_legend_handles_labels()
-                if handles:
-                    ax.legend(handles, labels)
-                fig.tight_layout()
-                canvas = FigureCanvas(fig)
-                tab = QWidget()
-                layout = QVBoxLayout(tab)
-                layout.addWidget(canvas)
-                self.tabs.addTab(tab, 'Accuracy')
-
-        # ナビゲーションツールバー追加
-        first_canvas = self.tabs.widget(0).findChild(FigureCanvas)
-        self.toolbar = NavigationToolbar(first_canvas, self)
-        self.left_layout.insertWidget(0, self.toolbar)
-
-    def draw_metric(self, ax, metric, conn):
-        color = self.color_map.get(metric)
-        for idx, log in enumerate(self.logs):
-            df = log['df']
-            style = self.line_styles[idx % len(self.line_styles)]
-            tcol = f"train_{metric}"
-            vcol = f"val_{metric}"
-            if tcol in df.columns:
-                ax.plot(df[tcol].values, label=f"{log['name']}:{tcol}", color=color, linestyle=style)
-            if vcol in df.columns:
-                ax.plot(df[vcol].values, label=f"{log['name']}:{vcol}", color=color, linestyle='--')
-            if metric in df.columns and tcol not in df.columns and vcol not in df.columns:
-                ax.plot(df[metric].values, label=f"{log['name']}:{metric}", color=color, linestyle='-')
-        ax.set_xlabel('Epoch')
-
-    def plot_combined(self, ax, metric):
-        color = self.color_map.get(metric)
-        train_series, val_series, base_series = [], [], []
-        for log in self.logs:
-            df = log['df']
-            tcol, vcol = f"train_{metric}", f"val_{metric}"
-            if tcol in df.columns:
-                train_series.append(df[tcol].values)
-            if vcol in df.columns:
-                val_series.append(df[vcol].values)
-            if metric in df.columns and tcol not in df.columns and vcol not in df.columns:
-                base_series.append(df[metric].values)
-        if train_series:
-            y = np.concatenate(train_series); x = np.arange(len(y))
-            ax.plot(x, y, label=f"train_{metric}", color=color, linestyle='-')
-        if val_series:
-            y = np.concatenate(val_series); x = np.arange(len(y))
-            ax.plot(x, y, label=f"val_{metric}", color=color, linestyle='--')
-        if not train_series and not val_series and base_series:
-            y = np.concatenate(base_series); x = np.arange(len(y))
-            ax.plot(x, y, label=metric, color=color, linestyle='-')
-        ax.set_xlabel('Iterations')
+            QVBoxLayout(tab)
+            self.tabs.addTab(tab, title)
+        self.tabs.setCurrentIndex(min(max(current, 0), self.tabs.count() - 1))
+        self.tabs.blockSignals(False)
+        self.on_tab_changed(self.tabs.currentIndex())
 
     def save_plot(self):
+        if self.exporter is not None:
+            return
         name = self.edit_filename.text().strip()
         if not name:
             QMessageBox.warning(self, "警告", "ファイル名を入力してください。")
             return
+        if self.plot_spec is None:
+            QMessageBox.warning(self, "警告", "先にプロットしてください。")
+            return
         directory = QFileDialog.getExistingDirectory(self, "プロット保存先を選択")
         if not directory:
             return
-        base, ext = os.path.splitext(name)
-        ext = ext or '.png'
-        for i in range(self.tabs.count()):
-            title = self.tabs.tabText(i)
-            canvas = self.tabs.widget(i).findChild(FigureCanvas)
-            canvas.figure.set_size_inches(self.fig_size)
-            canvas.figure.savefig(os.path.join(directory, f"{title}_{base}{ext}"))
-        QMessageBox.information(self, "保存完了", f"プロットを保存しました：\n{directory}")
+        base, exts = split_formats(name, self.edit_formats.text().split(','))
+        tabs = [self.tabs.tabText(i) for i in range(self.tabs.count())]
+
+        self.btn_save.setEnabled(False)
+        self.export_dialog = QProgressDialog("プロットを保存しています...", "キャンセル", 0, len(tabs), self)
+        self.export_dialog.setMinimumDuration(0)
+        self.export_dialog.setValue(0)
+        self.exporter = ExportWorker(self.plot_spec, tabs, directory, base, exts, self.spin_dpi.value(), self)
+        self.exporter.progress.connect(self.export_dialog.setValue)
+        self.exporter.exported.connect(self.on_exported)
+        self.export_dialog.canceled.connect(self.cancel_export)
+        self.exporter.start()
+
+    def cancel_export(self):
+        if self.exporter is not None:
+            self.exporter.cancelled = True
+
+    def on_exported(self, paths, errors):
+        exporter = self.exporter
+        exporter.wait()
+        self.exporter = None
+        self.export_dialog.close()
+        self.btn_save.setEnabled(True)
+        if exporter.cancelled:
+            return
+        if errors:
+            detail = "\n".join(f"{title}: {e}" for title, e in errors)
+            QMessageBox.warning(self, "保存エラー", f"保存できなかった図があります：\n{detail}")
+        if paths:
+            QMessageBox.information(self, "保存完了", f"プロットを保存しました：\n{exporter.directory}")
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
@@ -0,0 +1,153 @@
+import os
+import sys
+from time import perf_counter
+from contextlib import contextmanager, nullcontext
+
+import torch
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+class StepHook:
+    # 各区間の開始・終了で呼ばれるフック．必要なメソッドだけ上書きして使う
+    def phase_start(self, phase, step):
+        pass
+
+    def phase_end(self, phase, step, seconds):
+        pass
+
+
+class NvtxHook(StepHook):
+    # Nsight Systems などで区間を確認するための NVTX レンジ
+    def phase_start(self, phase, step):
+        torch.cuda.nvtx.range_push(f"{phase}:{step}")
+
+    def phase_end(self, phase, step, seconds):
+        torch.cuda.nvtx.range_pop()
+
+
+def null_phase(name):
+    return nullcontext()
+
+
+class StepProfiler:
+    # 学習ステップを data / h2d / forward / backward / optimizer の区間に分けて計測する
+    # 正確な時間を測るため区間の境界でデバイスを同期する (計測時のみ有効にすること)
+    PHASES = ('data', 'h2d', 'forward', 'backward', 'optimizer')
+
+    def __init__(self, device, hooks=None, profile_steps=None, trace_dir=None):
+        self.device = torch.device(device)
+        self.hooks = list(hooks or [])
+        self.profile_steps = profile_steps
+        self.trace_dir = trace_dir
+        self.torch_prof = None
+        self.traced = False
+        self.step = 0
+        self.start_epoch()
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def sync(self):
+        if self.device.type == 'cuda':
+            torch.cuda.synchronize(self.device)
+
+    def start_epoch(self):
+        self.times = {p: 0.0 for p in self.PHASES}
+        self.samples = 0
+        self.sync()
+        if self.device.type == 'cuda':
+            torch.cuda.reset_peak_memory_stats(self.device)
+        self.epoch_start = perf_counter()
+        self.mark = self.epoch_start
+        self.elapsed = None
+        self.peak = None
+
+    def end_epoch(self):
+        # 学習ループの終了時に呼ぶ (検証などその後の処理を Samples/sec に含めない)
+        self.sync()
+        self.elapsed = perf_counter() - self.epoch_start
+        self.peak = self.peak_memory_mb()
+
+    @contextmanager
+    def phase(self, name):
+        for hook in self.hooks:
+            hook.phase_start(name, self.step)
+        t0 = perf_counter()
+        yield
+        self.sync()
+        seconds = perf_counter() - t0
+        self.times[name] += seconds
+        for hook in self.hooks:
+            hook.phase_end(name, self.step, seconds)
+
+    def step_begin(self, step):
+        # 前のステップの終了からバッチが届くまでを DataLoader の待ち時間とする
+        self.step = step
+        seconds = perf_counter() - self.mark
+        self.times['data'] += seconds
+        for hook in self.hooks:
+            hook.phase_start('data', step)
+            hook.phase_end('data', step, seconds)
+        # 再開して範囲の途中から始まった場合もそこから記録する (範囲を過ぎてから再開した場合は記録しない)
+        if (self.profile_steps is not None and not self.traced
+                and self.profile_steps[0] <= step < self.profile_steps[1]):
+            self.start_trace()
+
+    def step_end(self, samples):
+        self.samples += samples
+        if self.torch_prof is not None:
+            self.torch_prof.step()
+            if self.step >= self.profile_steps[1] - 1:
+                self.stop_trace()
+        self.mark = perf_counter()
+
+    def start_trace(self):
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if self.device.type == 'cuda':
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+        self.torch_prof = torch.profiler.profile(activities=activities, record_shapes=True, profile_memory=True)
+        self.torch_prof.__enter__()
+        self.traced = True
+
+    def stop_trace(self):
+        prof, self.torch_prof = self.torch_prof, None
+        prof.__exit__(None, None, None)
+        if self.trace_dir:
+            os.makedirs(self.trace_dir, exist_ok=True)
+            start, end = self.profile_steps
+            prof.export_chrome_trace(os.path.join(self.trace_dir, f"trace_{start}_{end}.json"))
+
+    def close(self):
+        # 記録範囲の途中で学習が終わった (例外を含む) 場合もトレースを閉じて書き出す
+        if self.torch_prof is not None:
+            self.stop_trace()
+
+    def peak_memory_mb(self):
+        # (列名, 値)．GPU はエポック内のピーク，CPU はエポックごとに戻せないためプロセス開始からの最大 RSS
+        if self.device.type == 'cuda':
+            return 'Peak Mem (MB)', torch.cuda.max_memory_allocated(self.device) / 2**20
+        if resource is None:
+            return 'Max RSS (MB)', float('nan')
+        # ru_maxrss は Linux では KB，macOS では byte
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return 'Max RSS (MB)', rss / 2**20 if sys.platform == 'darwin' else rss / 2**10
+
+    def summary(self):
+        # エポックの集計 (ログの追加列になる．時間は秒)
+        elapsed = self.elapsed if self.elapsed is not None else perf_counter() - self.epoch_start
+        mem_name, mem = self.peak if self.peak is not None else self.peak_memory_mb()
+        compute = self.times['forward'] + self.times['backward'] + self.times['optimizer']
+        return {
+            'Data Time': self.times['data'],
+            'H2D Time': self.times['h2d'],
+            'Forward Time': self.times['forward'],
+            'Backward Time': self.times['backward'],
+            'Optimizer Time': self.times['optimizer'],
+            'Compute Time': compute,
+            'Samples/sec': self.samples / elapsed if elapsed > 0 else float('nan'),
+            mem_name: mem,
+        }
@@ -0,0 +1,235 @@
+import os
+import re
+import ast
+import json
+import time
+import sqlite3
+import argparse
+import numpy as np
+
+from log_reader import IncrementalCSVReader
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_dir TEXT PRIMARY KEY,
+    log_path TEXT,
+    log_mtime_ns INTEGER,
+    log_size INTEGER,
+    cfg_path TEXT,
+    cfg_mtime_ns INTEGER,
+    config TEXT,
+    columns TEXT,
+    rows INTEGER,
+    best_val_acc REAL,
+    last_val_acc REAL,
+    last_train_loss REAL,
+    last_val_loss REAL,
+    indexed REAL
+)
+"""
+# 表の列として直接フィルタ・並べ替えできる値 (それ以外の名前は Config の値として扱う)
+FIELDS = ('run_dir', 'rows', 'best_val_acc', 'last_val_acc', 'last_train_loss', 'last_val_loss')
+FILTER_RE = re.compile(r'^\s*([^<>=!~]+?)\s*(<=|>=|!=|==|=|<|>|~)\s*(.*?)\s*$')
+
+
+def norm_name(col):
+    # "Val Acc" と "val_acc" を同じ名前として扱う
+    return col.strip().lower().replace(' ', '_')
+
+
+def read_config(path):
+    # Configファイルは実行せず，config = {...} の値だけを取り出す
+    try:
+        with open(path, encoding='utf-8') as f:
+            tree = ast.parse(f.read(), path)
+    except (OSError, SyntaxError, ValueError):
+        return None
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == 'config' for t in node.targets):
+            try:
+                return ast.literal_eval(node.value)
+            except ValueError:
+                return None
+    return None
+
+
+def find_config(run_dir):
+    # main() が実行フォルダにコピーした Config (フォルダ直下の .py)
+    try:
+        names = sorted(n for n in os.listdir(run_dir) if n.endswith('.py'))
+    except OSError:
+        return None
+    return os.path.join(run_dir, names[0]) if names else None
+
+
+def summarize(path):
+    reader = IncrementalCSVReader(path)
+    reader.read()
+    columns = {norm_name(c): reader.data[c].values for c in reader.columns}
+
+    def last(name):
+        y = columns.get(name)
+        if y is None:
+            return None
+        y = y[~np.isnan(y)]
+        return float(y[-1]) if len(y) else None
+
+    val_acc = columns.get('val_acc')
+    best = None
+    if val_acc is not None and np.any(~np.isnan(val_acc)):
+        best = float(np.nanmax(val_acc))
+    return {
+        'columns': reader.columns,
+        'rows': reader.rows,
+        'best_val_acc': best,
+        'last_val_acc': last('val_acc'),
+        'last_train_loss': last('train_loss'),
+        'last_val_loss': last('val_loss'),
+    }
+
+
+def find_logs(root, log_name='log.csv'):
+    # <実行フォルダ>/log/log.csv を探す (スイープのように階層が深くてもよい)
+    for dirpath, dirnames, filenames in os.walk(root):
+        if os.path.basename(dirpath) == 'log' and log_name in filenames:
+            dirnames[:] = []
+            yield os.path.join(dirpath, log_name)
+
+
+def parse_filter(text):
+    m = FILTER_RE.match(text)
+    if m is None:
+        raise ValueError(f"invalid filter: {text}")
+    key, op, value = m.groups()
+    try:
+        value = ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        pass
+    return key, {'=': '==', '==': '=='}.get(op, op), value
+
+
+class RunCatalog:
+    # output/ 以下の実行を SQLite に索引する
+    # ログと Config の更新時刻・サイズが変わった実行だけ読み直す
+    def __init__(self, root='./output', db_path=None):
+        self.root = root
+        self.db_path = db_path or os.path.join(root, 'catalog.sqlite')
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute(SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def update(self, cancelled=None):
+        # (追加・更新した数, 削除した数)．cancelled() が真になったら途中で止める (それまでの分は保存)
+        known = {
+            row[0]: row[1:]
+            for row in self.conn.execute('SELECT run_dir, log_mtime_ns, log_size, cfg_path, cfg_mtime_ns FROM runs')
+        }
+        seen = set()
+        changed = 0
+        with self.conn:
+            for log_path in find_logs(self.root):
+                if cancelled is not None and cancelled():
+                    return changed, 0
+                run_dir = os.path.abspath(os.path.dirname(os.path.dirname(log_path)))
+                seen.add(run_dir)
+                try:
+                    st = os.stat(log_path)
+                except OSError:
+                    continue
+                cfg_path = find_config(run_dir)
+                cfg_mtime = os.stat(cfg_path).st_mtime_ns if cfg_path else None
+                if known.get(run_dir) == (st.st_mtime_ns, st.st_size, cfg_path, cfg_mtime):
+                    continue
+                try:
+                    summary = summarize(log_path)
+                except (OSError, ValueError):
+                    continue
+                config = read_config(cfg_path) if cfg_path else None
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (run_dir, os.path.abspath(log_path), st.st_mtime_ns, st.st_size, cfg_path, cfg_mtime,
+                     json.dumps(config, default=str), json.dumps(summary['columns']), summary['rows'],
+                     summary['best_val_acc'], summary['last_val_acc'], summary['last_train_loss'],
+                     summary['last_val_loss'], time.time())
+                )
+                changed += 1
+            removed = [r for r in known if r not in seen]
+            self.conn.executemany('DELETE FROM runs WHERE run_dir = ?', [(r,) for r in removed])
+        return changed, len(removed)
+
+    def query(self, filters=(), sort=None, descending=False, limit=None):
+        # filters: "lr<=1e-3" "dataset=cifar10" "best_val_acc>0.5" "run_dir~sweep" のような条件
+        where, params = [], []
+        for text in filters:
+            key, op, value = parse_filter(text)
+            expr = self._expr(key)
+            if op == '~':
+                where.append(f"{expr} LIKE ?")
+                params.append(f"%{value}%")
+            else:
+                where.append(f"{expr} {op} ?")
+                params.append(value)
+        sql = 'SELECT run_dir, log_path, config, columns, rows, best_val_acc, last_val_acc, last_train_loss, last_val_loss FROM runs'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        if sort:
+            sql += f" ORDER BY {self._expr(sort)} IS NULL, {self._expr(sort)} {'DESC' if descending else 'ASC'}"
+        else:
+            sql += ' ORDER BY run_dir'
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        runs = []
+        for row in self.conn.execute(sql, params):
+            run = dict(zip(('run_dir', 'log_path', 'config', 'columns', 'rows', 'best_val_acc',
+                            'last_val_acc', 'last_train_loss', 'last_val_loss'), row))
+            run['config'] = json.loads(run['config']) or {}
+            run['columns'] = json.loads(run['columns'])
+            runs.append(run)
+        return runs
+
+    def _expr(self, key):
+        if key in FIELDS:
+            return key
+        # Config の値 (JSON として保存した config 列から取り出す)
+        return "json_extract(config, '$.\"%s\"')" % key.replace('"', '').replace("'", '')
+
+
+def format_value(v):
+    if isinstance(v, float):
+        return f"{v:.4g}"
+    return '' if v is None else str(v)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--root', type=str, default='./output', help="学習結果のフォルダ")
+    parser.add_argument('--db', type=str, default=None, help="カタログのファイル (既定: <root>/catalog.sqlite)")
+    parser.add_argument('--where', nargs='*', default=[], help="条件 (例: lr<=1e-3 dataset=cifar10 best_val_acc>0.5 run_dir~sweep)")
+    parser.add_argument('--sort', type=str, default=None, help="並べ替えに使う値 (例: best_val_acc, lr)")
+    parser.add_argument('--desc', action='store_true', help="降順に並べる")
+    parser.add_argument('--limit', type=int, default=None, help="表示する件数")
+    parser.add_argument('--show', nargs='*', default=['lr', 'batch_size'], help="表示する Config の値")
+    parser.add_argument('--paths', action='store_true', help="ログのパスだけを表示 (plot_batch.py などに渡す用)")
+    args = parser.parse_args()
+
+    catalog = RunCatalog(args.root, args.db)
+    changed, removed = catalog.update()
+    runs = catalog.query(args.where, args.sort, args.desc, args.limit)
+    catalog.close()
+    if args.paths:
+        for run in runs:
+            print(run['log_path'])
+    else:
+        print(f"{len(runs)} runs (updated {changed}, removed {removed})")
+        header = ['run_dir', *args.show, 'rows', 'best_val_acc', 'last_train_loss']
+        print('\t'.join(header))
+        for run in runs:
+            values = [os.path.relpath(run['run_dir'], args.root)]
+            values += [format_value(run['config'].get(k)) for k in args.show]
+            values += [format_value(run[k]) for k in ('rows', 'best_val_acc', 'last_train_loss')]
+            print('\t'.join(values))
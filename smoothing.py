@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+
+from log_reader import GrowableArray
+
+# 平滑化の種類 (none / ema / mean / median) と帯の種類 (std: 平均±標準偏差，minmax: 最小〜最大)
+METHODS = ('none', 'ema', 'mean', 'median')
+BANDS = ('std', 'minmax')
+
+
+def smooth(y, method='none', window=1):
+    # 系列全体を平滑化する (NaN は無視)．窓は先頭で足りない分を詰めて計算する
+    if method == 'none' or window <= 1:
+        return np.asarray(y)
+    s = pd.Series(np.asarray(y, dtype=np.float64))
+    if method == 'ema':
+        out = s.ewm(span=window, adjust=False, ignore_na=True).mean()
+    elif method == 'mean':
+        out = s.rolling(window, min_periods=1).mean()
+    elif method == 'median':
+        out = s.rolling(window, min_periods=1).median()
+    else:
+        raise ValueError(f"unknown smoothing method: {method}")
+    return out.to_numpy(dtype=np.float32)
+
+
+def smooth_tail(y, start, prev, method, window):
+    # y[start:] の平滑化後の値．prev はそれまでの平滑化結果 (いずれも因果的なので過去の値は変わらない)
+    if method == 'ema':
+        last = prev[~np.isnan(prev)]
+        if not len(last):
+            return smooth(y[start:], method, window)
+        return smooth(np.concatenate([last[-1:], y[start:]]), method, window)[1:]
+    lo = max(0, start - window + 1)
+    return smooth(y[lo:], method, window)[start - lo:]
+
+
+class SmoothedSeries:
+    # 1系列分の平滑化結果．同じ系列が伸びただけなら増えた分だけ計算して追記する
+    def __init__(self, method, window):
+        self.method = method
+        self.window = window
+        self.key = None
+        self.values = GrowableArray(np.float32)
+
+    def update(self, key, y):
+        if self.method == 'none' or self.window <= 1:
+            return y
+        n = len(self.values)
+        if key == self.key and len(y) >= n:
+            if len(y) > n:
+                self.values.extend(smooth_tail(y, n, self.values.values, self.method, self.window))
+        else:
+            # 別の系列・切り詰め時は新しいバッファに作り直す (描画中の配列は書き換えない)
+            self.values = GrowableArray(np.float32, capacity=max(len(y), 1))
+            self.values.extend(smooth(y, self.method, self.window))
+        self.key = key
+        return self.values.values
+
+
+class AggregateSeries:
+    # 複数ログの同じ系列をインデックス (エポック・イテレーション) で揃えて集計する
+    # 位置ごとの件数・和・二乗和・最小・最大を保持し，ログが伸びたら増えた位置だけ加算する
+    def __init__(self, method='none', window=1):
+        self.method = method
+        self.window = window
+        self.keys = None
+        self.reset()
+
+    def reset(self):
+        self.smoothers = []
+        self.lengths = []
+        self.count = GrowableArray(np.float64)
+        self.total = GrowableArray(np.float64)
+        self.squares = GrowableArray(np.float64)
+        self.low = GrowableArray(np.float64)
+        self.high = GrowableArray(np.float64)
+
+    def update(self, entries):
+        # entries: [(系列のキー, 値の配列)]
+        keys = [key for key, _ in entries]
+        if keys != self.keys or any(len(y) < n for (_, y), n in zip(entries, self.lengths)):
+            self.reset()
+            self.smoothers = [SmoothedSeries(self.method, self.window) for _ in entries]
+            self.lengths = [0] * len(entries)
+        self.keys = keys
+        for i, (key, y) in enumerate(entries):
+            start = self.lengths[i]
+            if len(y) == start:
+                continue
+            values = self.smoothers[i].update(key, y)[start:].astype(np.float64)
+            self._grow(len(y))
+            valid = ~np.isnan(values)
+            self.count.values[start:len(y)] += valid
+            self.total.values[start:len(y)] += np.where(valid, values, 0.0)
+            self.squares.values[start:len(y)] += np.where(valid, values * values, 0.0)
+            np.fmin(self.low.values[start:len(y)], values, out=self.low.values[start:len(y)])
+            np.fmax(self.high.values[start:len(y)], values, out=self.high.values[start:len(y)])
+            self.lengths[i] = len(y)
+        return self.stats()
+
+    def _grow(self, n):
+        extra = n - len(self.count)
+        if extra <= 0:
+            return
+        self.count.extend(np.zeros(extra))
+        self.total.extend(np.zeros(extra))
+        self.squares.extend(np.zeros(extra))
+        self.low.extend(np.full(extra, np.nan))
+        self.high.extend(np.full(extra, np.nan))
+
+    def stats(self):
+        # {'x', 'mean', 'std', 'min', 'max'}
+        count = self.count.values
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = self.total.values / count
+            var = self.squares.values / count - mean * mean
+        return {
+            'x': np.arange(len(count)),
+            'mean': mean,
+            'std': np.sqrt(np.maximum(var, 0.0)),
+            'min': self.low.values.copy(),
+            'max': self.high.values.copy(),
+        }
+
+
+def band_limits(stats, band):
+    if band == 'minmax':
+        return stats['min'], stats['max']
+    return stats['mean'] - stats['std'], stats['mean'] + stats['std']
+
@@ -0,0 +1,190 @@
+import os
+import ast
+import csv
+import glob
+import json
+import time
+import pprint
+import argparse
+import itertools
+import importlib.util
+import traceback
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# train.py (torch) はワーカープロセス内で読み込む (スレッド数の環境変数を先に設定するため)
+DONE_NAME = 'DONE'
+SUMMARY_NAME = 'sweep_summary.csv'
+THREAD_ENV = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')
+
+
+def load_config(config_path):
+    spec = importlib.util.spec_from_file_location("config_module", config_path)
+    config_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(config_module)
+    return config_module.config
+
+
+def parse_value(text):
+    # "1e-3" → 0.001，"True" → True，それ以外は文字列のまま
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return text
+
+
+def parse_grid(items):
+    # ["lr=1e-3,1e-4", "batch_size=64,128"] → {"lr": [0.001, 0.0001], "batch_size": [64, 128]}
+    grid = {}
+    for item in items or []:
+        key, _, values = item.partition('=')
+        grid[key] = [parse_value(v) for v in values.split(',')]
+    return grid
+
+
+def value_name(v):
+    return str(v).replace(os.sep, '-').replace('/', '-').replace(' ', '')
+
+
+def expand_grid(config, grid):
+    # [(実行名, 設定, 変えた値)]．実行名は出力ディレクトリ名になるので値から決める (再開時に同じ名前になる)
+    if not grid:
+        return [('base', dict(config), {})]
+    keys = list(grid)
+    runs = []
+    for values in itertools.product(*(grid[k] for k in keys)):
+        params = dict(zip(keys, values))
+        name = '_'.join(f"{k}={value_name(v)}" for k, v in params.items())
+        runs.append((name, {**config, **params}, params))
+    return runs
+
+
+def config_dir_runs(directory):
+    runs = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.py'))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        runs.append((name, load_config(path), {'config': name}))
+    return runs
+
+
+def write_config(path, config):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('config = ' + pprint.pformat(config, sort_dicts=False) + '\n')
+
+
+def core_slots(workers):
+    # 使えるコアをワーカー数で均等に分ける
+    try:
+        cores = sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = list(range(os.cpu_count() or 1))
+    per = max(1, len(cores) // workers)
+    return [cores[i * per:(i + 1) * per] or cores for i in range(workers)]
+
+
+def init_worker(slots, threads):
+    # ワーカープロセスごとにコアの割り当てを1つ受け取り，スレッド数をそれに合わせる
+    cores = slots.get()
+    threads = threads or len(cores)
+    for name in THREAD_ENV:
+        os.environ[name] = str(threads)
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cores)
+    os.environ['SWEEP_NUM_THREADS'] = str(threads)
+
+
+def run_job(name, config, run_dir):
+    import train
+
+    config = dict(config)
+    if config.get('num_threads') is None and 'SWEEP_NUM_THREADS' in os.environ:
+        config['num_threads'] = int(os.environ['SWEEP_NUM_THREADS'])
+    os.makedirs(run_dir, exist_ok=True)
+    config_path = os.path.join(run_dir, 'config.py')
+    write_config(config_path, config)
+    # 途中で止まった実行はチェックポイントから再開する
+    # (チェックポイントがなければ最初から学習し，前回の途中までのログは消える)
+    start = time.time()
+    result = train.main(config_path, config, resume=run_dir)
+    result = {'Seconds': time.time() - start, **(result or {})}
+    tmp = os.path.join(run_dir, DONE_NAME + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False)
+    os.replace(tmp, os.path.join(run_dir, DONE_NAME))
+    return result
+
+
+def read_done(run_dir):
+    try:
+        with open(os.path.join(run_dir, DONE_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_summary(path, records):
+    columns = []
+    for r in records:
+        columns += [k for k in r if k not in columns]
+    tmp = path + '.tmp'
+    with open(tmp, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, columns)
+        writer.writeheader()
+        writer.writerows(records)
+    os.replace(tmp, path)
+
+
+def main(args):
+    if args.config_dir:
+        runs = config_dir_runs(args.config_dir)
+    else:
+        runs = expand_grid(load_config(args.config_path), parse_grid(args.grid))
+    os.makedirs(args.out, exist_ok=True)
+
+    records = {}
+    jobs = []
+    for name, config, params in runs:
+        run_dir = os.path.join(args.out, name)
+        done = read_done(run_dir)
+        if done is not None:
+            records[name] = {'Run': name, 'Status': 'done', **params, **done}
+        else:
+            records[name] = {'Run': name, 'Status': 'pending', **params}
+            jobs.append((name, config, run_dir))
+    summary_path = os.path.join(args.out, SUMMARY_NAME)
+    ordered = lambda: [records[name] for name, _, _ in runs]
+    write_summary(summary_path, ordered())
+    print(f"{len(runs)} runs, {len(runs) - len(jobs)} already finished")
+
+    workers = max(1, min(args.workers, len(jobs) or 1))
+    ctx = mp.get_context('spawn')
+    slots = ctx.Queue()
+    for cores in core_slots(workers):
+        slots.put(cores)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=init_worker, initargs=(slots, args.threads)) as ex:
+        futures = {ex.submit(run_job, name, config, run_dir): name for name, config, run_dir in jobs}
+        for finished, fut in enumerate(as_completed(futures), 1):
+            name = futures[fut]
+            try:
+                records[name].update(fut.result(), Status='done')
+            except Exception:
+                records[name]['Status'] = 'failed'
+                print(traceback.format_exc())
+            print(f"[{finished}/{len(jobs)}] {name}: {records[name]['Status']}")
+            write_summary(summary_path, ordered())
+    print(f"Summary: {summary_path}")
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--config_path', type=str, default='./Config/resnet_config.py', help="元になるConfigファイル")
+    parser.add_argument('--grid', nargs='*', default=None, help="変える値 (例: lr=1e-3,1e-4 batch_size=64,128)")
+    parser.add_argument('--config_dir', type=str, default=None, help="Configファイルのフォルダ (指定時は各ファイルを1実行とする)")
+    parser.add_argument('--out', type=str, default='./output/sweep', help="出力先ディレクトリ")
+    parser.add_argument('--workers', type=int, default=1, help="同時に実行する数")
+    parser.add_argument('--threads', type=int, default=None, help="1実行あたりのスレッド数 (既定: 割り当てコア数)")
+
+    args = parser.parse_args()
+    main(args)
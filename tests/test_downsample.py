@@ -0,0 +1,102 @@
+import numpy as np
+
+from downsample import visible_range, minmax_downsample, lttb_downsample, downsample, band_downsample
+
+
+def test_visible_range_includes_one_point_outside():
+    x = np.arange(10, dtype=float)
+    assert visible_range(x, 3, 6) == (2, 8)
+    # 範囲が端をはみ出しても配列の範囲に収める
+    assert visible_range(x, -5, 100) == (0, 10)
+
+
+def test_minmax_passthrough_when_small():
+    x = np.arange(10, dtype=float)
+    y = np.random.default_rng(0).random(10)
+    ox, oy = minmax_downsample(x, y, 10)
+    assert ox is x and oy is y
+
+
+def test_minmax_keeps_endpoints_and_bucket_extrema():
+    rng = np.random.default_rng(0)
+    n, buckets = 10000, 50
+    x = np.arange(n, dtype=float)
+    y = rng.normal(size=n)
+    ox, oy = minmax_downsample(x, y, buckets)
+    assert len(ox) <= 2 * buckets + 2
+    assert ox[0] == x[0] and ox[-1] == x[-1]
+    assert np.all(np.diff(ox) > 0)
+    # 各バケットの最小値・最大値が残っている
+    edges = np.linspace(x[0], x[-1], buckets + 1)
+    starts = np.searchsorted(x, edges[:-1])
+    for s, e in zip(starts, np.append(starts[1:], n)):
+        kept = oy[(ox >= x[s]) & (ox < x[e - 1] + 0.5)]
+        assert kept.min() == y[s:e].min()
+        assert kept.max() == y[s:e].max()
+
+
+def test_minmax_ignores_nan():
+    n = 1000
+    x = np.arange(n, dtype=float)
+    y = np.sin(x / 50)
+    y[100:200] = np.nan
+    ox, oy = minmax_downsample(x, y, 20)
+    assert np.nanmax(oy) == np.nanmax(y)
+    assert np.nanmin(oy) == np.nanmin(y)
+
+
+def test_lttb_size_and_endpoints():
+    rng = np.random.default_rng(1)
+    x = np.arange(5000, dtype=float)
+    y = rng.normal(size=5000).cumsum()
+    ox, oy = lttb_downsample(x, y, 100)
+    assert len(ox) == 100
+    assert ox[0] == x[0] and ox[-1] == x[-1]
+    assert np.all(np.diff(ox) > 0)
+    # 選ばれた点は元の点
+    assert np.array_equal(oy, y[ox.astype(int)])
+
+
+def test_lttb_passthrough_and_nan():
+    x = np.arange(50, dtype=float)
+    y = np.cos(x)
+    ox, oy = lttb_downsample(x, y, 50)
+    assert ox is x and oy is y
+    y = np.cos(np.arange(1000, dtype=float))
+    y[::3] = np.nan
+    ox, oy = lttb_downsample(np.arange(1000, dtype=float), y, 100)
+    assert len(ox) == 100 and np.isfinite(oy).all()
+
+
+def test_downsample_with_xlim():
+    x = np.arange(100000, dtype=float)
+    y = np.sin(x / 1000)
+    ox, oy = downsample(x, y, 200, xlim=(50000, 40000))
+    assert 39999 <= ox[0] and ox[-1] <= 50001
+    assert len(ox) <= 202
+
+
+def test_band_downsample():
+    x = np.arange(1000, dtype=float)
+    low = np.sin(x / 30) - 1
+    high = np.sin(x / 30) + 1
+    ox, ol, oh = band_downsample(x, low, high, 100)
+    assert len(ox) <= 100 and ox[0] == x[0]
+    # 区間ごとに下限の最小・上限の最大をとるので帯は元より狭くならない
+    assert ol.min() == low.min() and oh.max() == high.max()
+    k = 1000 // len(ox)
+    assert np.array_equal(ol, low.reshape(-1, k).min(axis=1))
+    # n_out 以下はそのまま
+    ox, ol, oh = band_downsample(x[:50], low[:50], high[:50], 100)
+    assert len(ox) == 50 and np.array_equal(ol, low[:50])
+
+
+def test_band_downsample_all_nan_bucket():
+    x = np.arange(100, dtype=float)
+    low = np.zeros(100)
+    high = np.ones(100)
+    low[:10] = np.nan
+    high[:10] = np.nan
+    ox, ol, oh = band_downsample(x, low, high, 10)
+    assert np.isnan(ol[0]) and np.isnan(oh[0])
+    assert np.all(ol[1:] == 0) and np.all(oh[1:] == 1)
@@ -0,0 +1,82 @@
+import os
+
+import numpy as np
+
+from log_cache import LogCache
+from log_reader import IncrementalCSVReader
+
+
+def write_log(path, rows, start=0, header=True):
+    with open(path, 'a', encoding='utf-8') as f:
+        if header:
+            f.write('epoch,train_loss,val_loss\n')
+        for i in range(start, start + rows):
+            f.write(f"{i},{1 / (i + 1)},{2 / (i + 1)}\n")
+
+
+def test_restore_from_cache(tmp_path):
+    path = str(tmp_path / 'log.csv')
+    write_log(path, 100)
+    cache = LogCache(root=str(tmp_path / 'cache'), min_bytes=0)
+    first = IncrementalCSVReader(path, cache=cache)
+    first.read()
+    assert cache.load(path) is not None
+
+    second = IncrementalCSVReader(path, cache=cache)
+    assert second.read()
+    assert second.rows == 100 and second.columns == first.columns
+    for c in first.columns:
+        assert np.array_equal(second.data[c].values, first.data[c].values)
+
+
+def test_cache_then_append(tmp_path):
+    # キャッシュから開いたあとに追記された行は差分だけ読む
+    path = str(tmp_path / 'log.csv')
+    write_log(path, 50)
+    cache = LogCache(root=str(tmp_path / 'cache'), min_bytes=0)
+    IncrementalCSVReader(path, cache=cache).read()
+    write_log(path, 10, start=50, header=False)
+    assert cache.load(path) is None
+
+    reader = IncrementalCSVReader(path, cache=cache)
+    reader.read()
+    assert reader.rows == 60
+    assert np.array_equal(reader.data['epoch'].values, np.arange(60))
+
+
+def test_small_files_not_cached(tmp_path):
+    path = str(tmp_path / 'log.csv')
+    write_log(path, 10)
+    cache = LogCache(root=str(tmp_path / 'cache'))
+    IncrementalCSVReader(path, cache=cache).read()
+    assert cache.load(path) is None
+
+
+def test_inconsistent_entry_ignored(tmp_path):
+    # 列の長さが揃っていないエントリ (書き換え途中) は使わない
+    path = str(tmp_path / 'log.csv')
+    write_log(path, 20)
+    cache = LogCache(root=str(tmp_path / 'cache'), min_bytes=0)
+    IncrementalCSVReader(path, cache=cache).read()
+    np.save(os.path.join(cache.entry_dir(path), '1.npy'), np.zeros(5, dtype=np.float32))
+    assert cache.load(path) is None
+    reader = IncrementalCSVReader(path, cache=cache)
+    reader.read()
+    assert reader.rows == 20
+
+
+def test_evict_oldest(tmp_path):
+    cache = LogCache(root=str(tmp_path / 'cache'), min_bytes=0)
+    paths = []
+    for i in range(3):
+        path = str(tmp_path / f"log{i}.csv")
+        write_log(path, 200)
+        IncrementalCSVReader(path, cache=cache).read()
+        entry = cache.entry_dir(path)
+        os.utime(entry, (i, i))
+        paths.append(path)
+    size = max(s for _, s, _ in cache.entries())
+    cache.max_bytes = 2 * size
+    cache.evict()
+    assert cache.load(paths[0]) is None
+    assert cache.load(paths[1]) is not None and cache.load(paths[2]) is not None
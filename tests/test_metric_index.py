@@ -0,0 +1,89 @@
+import numpy as np
+
+from log_reader import IncrementalCSVReader
+from metric_index import split_column, LogIndex, ConnectedSeries
+
+
+def write_log(path, epochs, header=True):
+    with open(path, 'a', encoding='utf-8') as f:
+        if header:
+            f.write('Epoch,Train_Loss,Val_Loss,lr\n')
+        for e in epochs:
+            f.write(f"{e},{1 / (e + 1)},{2 / (e + 1)},0.1\n")
+
+
+def open_log(path):
+    reader = IncrementalCSVReader(path)
+    reader.read()
+    return {'reader': reader, 'index': LogIndex(reader)}
+
+
+def test_split_column():
+    assert split_column('train_loss') == ('loss', 'train')
+    assert split_column('Val_Acc') == ('Acc', 'val')
+    assert split_column('Epoch') == ('Epoch', 'x')
+    assert split_column('iteration') == ('iteration', 'x')
+    assert split_column('lr') == ('lr', 'plain')
+
+
+def test_log_index(tmp_path):
+    path = str(tmp_path / 'log.csv')
+    write_log(path, range(1, 6))
+    log = open_log(path)
+    index = log['index']
+    assert index.metrics == ['Loss', 'lr']
+    assert set(index.series('Loss')) == {'train', 'val'}
+    assert index.x_column == 'Epoch'
+    assert index.x.dtype == np.float64
+    assert np.array_equal(index.x, np.arange(1, 6))
+
+
+def test_x_falls_back_to_row_number(tmp_path):
+    path = str(tmp_path / 'log.csv')
+    write_log(path, [0, 1, 2])
+    log = open_log(path)
+    assert np.array_equal(log['index'].x, [0, 1, 2])
+    # 昇順でなくなったら行番号に切り替える
+    write_log(path, [1], header=False)
+    log['reader'].read()
+    assert np.array_equal(log['index'].x, np.arange(4))
+
+
+def test_connected_series_shift_and_extend(tmp_path):
+    a, b = str(tmp_path / 'a.csv'), str(tmp_path / 'b.csv')
+    write_log(a, range(5))
+    write_log(b, range(3))
+    logs = [open_log(a), open_log(b)]
+    conn = ConnectedSeries('Loss', 'train')
+    x, y = conn.update(logs)
+    # 2つ目のログは1つ目の続きになるようにずらす
+    assert np.array_equal(x, np.arange(8))
+    assert conn.boundaries == [5.0]
+    generation = conn.generation
+
+    # 最後のログが伸びただけなら追記で済ませる
+    write_log(b, [3, 4], header=False)
+    logs[1]['reader'].read()
+    x, y = conn.update(logs)
+    assert conn.generation == generation
+    assert np.array_equal(x, np.arange(10))
+    assert len(y) == 10
+
+    # 途中のログが伸びたら作り直す
+    write_log(a, [5], header=False)
+    logs[0]['reader'].read()
+    x, y = conn.update(logs)
+    assert conn.generation == generation + 1
+    assert np.array_equal(x, np.arange(11))
+    assert conn.boundaries == [6.0]
+
+
+def test_connected_series_keeps_continued_epochs(tmp_path):
+    # 続きの番号から始まるログ (再開後のログなど) はずらさない
+    a, b = str(tmp_path / 'a.csv'), str(tmp_path / 'b.csv')
+    write_log(a, range(1, 4))
+    write_log(b, range(10, 12))
+    conn = ConnectedSeries('Loss', 'val')
+    x, _ = conn.update([open_log(a), open_log(b)])
+    assert np.array_equal(x, [1, 2, 3, 10, 11])
+    assert conn.boundaries == [10.0]
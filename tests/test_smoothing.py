@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from smoothing import smooth, SmoothedSeries, AggregateSeries, band_limits
+
+
+def test_smooth_methods():
+    y = np.array([1.0, 3.0, 2.0, 6.0])
+    assert smooth(y, 'none', 3) is y
+    assert np.allclose(smooth(y, 'mean', 2), [1, 2, 2.5, 4])
+    assert np.allclose(smooth(y, 'median', 3), [1, 2, 2, 3])
+    # ema (span=3, alpha=0.5)
+    assert np.allclose(smooth(y, 'ema', 3), [1, 2, 2, 4])
+    with pytest.raises(ValueError):
+        smooth(y, 'gauss', 3)
+
+
+def test_smooth_ignores_nan():
+    y = np.array([1.0, np.nan, 3.0])
+    assert np.allclose(smooth(y, 'mean', 2), [1, 1, 3])
+
+
+@pytest.mark.parametrize('method', ['ema', 'mean', 'median'])
+def test_smoothed_series_incremental(method):
+    # 追記ごとに差分だけ計算しても全体を計算し直した結果と一致する
+    y = np.random.default_rng(0).normal(size=300).astype(np.float32)
+    y[50:60] = np.nan
+    series = SmoothedSeries(method, 7)
+    for n in (1, 10, 55, 120, 300):
+        out = series.update('a', y[:n])
+    assert np.allclose(out, smooth(y, method, 7), equal_nan=True, atol=1e-5)
+
+
+def test_smoothed_series_rebuilds_on_new_key():
+    series = SmoothedSeries('mean', 2)
+    first = series.update('a', np.array([1.0, 3.0]))
+    second = series.update('b', np.array([5.0, 7.0]))
+    assert np.allclose(second, [5, 6])
+    # 描画中の配列は書き換えない
+    assert np.allclose(first, [1, 2])
+
+
+def test_aggregate_series():
+    a = np.array([1.0, 2.0, 3.0])
+    b = np.array([3.0, np.nan, 5.0, 7.0])
+    agg = AggregateSeries()
+    stats = agg.update([('a', a[:2]), ('b', b[:2])])
+    assert np.allclose(stats['mean'], [2, 2])
+    stats = agg.update([('a', a), ('b', b)])
+    assert np.array_equal(stats['x'], np.arange(4))
+    assert np.allclose(stats['mean'], [2, 2, 4, 7])
+    assert np.allclose(stats['std'], [1, 0, 1, 0])
+    assert np.allclose(stats['min'], [1, 2, 3, 7]) and np.allclose(stats['max'], [3, 2, 5, 7])
+    low, high = band_limits(stats, 'std')
+    assert np.allclose(low, [1, 2, 3, 7]) and np.allclose(high, [3, 2, 5, 7])
+    assert band_limits(stats, 'minmax')[0] is stats['min']
@@ -16,6 +16,10 @@ import timm
 from timm.models import create_model
 
 import trainer
+from metrics_logger import MetricsLogger
+from profiling import StepProfiler
+from dataset_cache import CachedDataset, BatchTransform, batch_loader
+from checkpoint import CheckpointWriter, load_latest
 
 def load_config(config_path):
 
@@ -25,24 +29,85 @@ def load_config(config_path):
 
     return config_module.config
 
-def save_to_csv(csv_file, epoch, train_loss=None, train_acc=None, val_loss=None, val_acc=None):
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
 
-    new_row = [
-        epoch,
-        train_loss if train_loss is not None else '',
-        train_acc if train_acc is not None else '',
-        val_loss if val_loss is not None else '',
-        val_acc if val_acc is not None else ''
-    ]
-    
-    with open(csv_file, mode='a', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(new_row)
+def select_device(config):
+    # "auto" のときはGPUがあればGPU，なければCPU
+    name = config.get('device', 'auto')
+    if name == 'auto':
+        name = 'cuda' if torch.cuda.is_available() else 'cpu'
+    return torch.device(name)
+
+def select_amp_dtype(config, device):
+    # 混合精度の型 (未指定時は GPU: float16，CPU: bfloat16)．None なら無効
+    if not config.get('amp', True):
+        return None
+    name = config.get('amp_dtype') or ('float16' if device.type == 'cuda' else 'bfloat16')
+    return getattr(torch, name)
+
+def select_num_workers(config, device):
+    num_workers = config.get('num_workers')
+    if num_workers is None:
+        cores = available_cores()
+        if config.get('dataset_cache', False):
+            # 前処理済みキャッシュはメモリマップから切り出すだけなので少なくてよい
+            num_workers = min(2, cores)
+        # CPU学習では演算スレッドにコアを残す
+        elif device.type == 'cuda':
+            num_workers = min(8, cores)
+        else:
+            num_workers = max(1, min(4, cores // 8))
+    return num_workers
+
+def configure_threads(config, device, num_workers):
+    # CPU学習ではデータローダーのワーカーを除いたコア数を演算スレッドに割り当てる
+    cores = available_cores()
+    num_threads = config.get('num_threads')
+    if num_threads is None and device.type == 'cpu':
+        num_threads = max(1, cores - num_workers)
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    interop = config.get('num_interop_threads')
+    if interop is None and device.type == 'cpu':
+        interop = max(1, min(4, cores // 8))
+    if interop:
+        try:
+            torch.set_num_interop_threads(interop)
+        except RuntimeError:
+            pass
 
-def main(config_path, config):
+def read_last_row(csv_file):
+    with open(csv_file, newline='') as f:
+        rows = list(csv.DictReader(f))
+    return {k: float(v) for k, v in rows[-1].items() if v} if rows else {}
+
+def make_output_dir(root='./output', name=None):
+    # 既に同名のディレクトリがあれば _1, _2, ... を付ける (同時に起動した別プロセスとも衝突しない)
+    name = name or datetime.now().strftime('%Y%m%d%H')
+    path = os.path.join(root, name)
+    suffix = 0
+    while True:
+        try:
+            os.makedirs(path)
+            return path
+        except FileExistsError:
+            suffix += 1
+            path = os.path.join(root, f"{name}_{suffix}")
+
+def main(config_path, config, resume=None, output_dir=None):
     
-    timestamp = datetime.now().strftime('%Y%m%d%H')
-    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    device = select_device(config)
+    amp_dtype = select_amp_dtype(config, device)
+    num_workers = select_num_workers(config, device)
+    pin_memory = config.get('pin_memory')
+    if pin_memory is None:
+        pin_memory = device.type == 'cuda'
+    configure_threads(config, device, num_workers)
+    memory_format = torch.channels_last if config.get('channels_last', False) else torch.contiguous_format
     
     # ハイパーパラメータ
     num_epoch = config['epoch']
@@ -52,22 +117,48 @@ def main(config_path, config):
     dataset_name = config['dataset']
 
     # 出力を保存するディレクトリ作成
-    base_path = './output/' + str(timestamp) + '/'
+    # resume を指定した場合はその出力ディレクトリに続けて書く
+    if resume:
+        base_path = resume
+    elif output_dir:
+        base_path = output_dir
+    else:
+        base_path = make_output_dir()
+    base_path = base_path.rstrip('/') + '/'
     sub_dirs = ['model/', 'log/']
     for sub in sub_dirs:
         path = base_path + sub
         os.makedirs(path, exist_ok=True)
 
+    # エポックごとのログ (毎行書き出す) とイテレーションごとのログ (まとめて書き出す)
     csv_file = base_path + 'log/log.csv'
-    if not os.path.exists(csv_file):
-        # ヘッダーを作成
-        with open(csv_file, mode='w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['Epoch', 'Train Loss', 'Train Acc', 'Val Loss', 'Val Acc'])
+    stream = config.get('stream', False)
+    binary = config.get('log_binary', False)
+    epoch_logger = MetricsLogger(
+        csv_file, ['Epoch', 'Train Loss', 'Train Acc', 'Val Loss', 'Val Acc'],
+        flush_rows=1, binary=binary, stream=stream
+    )
+    train_logger, val_logger = None, None
+    # イテレーションごとのログをホストへ読み出す間隔 (ステップ数)
+    log_interval = config.get('log_interval', 50)
+    if config.get('log_iterations', True):
+        log_kwargs = dict(
+            flush_interval=config.get('log_flush_interval', 5.0),
+            flush_rows=config.get('log_flush_rows', 1000),
+            binary=binary, stream=stream
+        )
+        train_logger = MetricsLogger(base_path + 'log/train_iter_log.csv', ['Iteration', 'Train Loss', 'Train Acc'], **log_kwargs)
+        val_logger = MetricsLogger(base_path + 'log/val_iter_log.csv', ['Iteration', 'Val Loss', 'Val Acc'], **log_kwargs)
+
+    # ステップ内の区間ごとの計測 (任意)．profile_steps で torch.profiler のトレースも取る
+    profiler = None
+    if config.get('profile', False):
+        profiler = StepProfiler(device, profile_steps=config.get('profile_steps'), trace_dir=base_path + 'profile/')
 
     cfg_name = config_path.split('/')[-1]
     cfg_dest = f"{base_path}/{cfg_name}"
-    shutil.copy(config_path, cfg_dest)
+    if not os.path.exists(cfg_dest) or not os.path.samefile(config_path, cfg_dest):
+        shutil.copy(config_path, cfg_dest)
 
     mean = [0.4915, 0.4823, 0.4468]
     std = [0.2470, 0.2435, 0.2616]
@@ -85,66 +176,140 @@ def main(config_path, config):
         transforms.Normalize(mean, std),
     ])
     
-    if dataset_name == 'cifar10':
-        train_dataset = torchvision.datasets.CIFAR10("./data", train=True, transform=train_transform, download=True)
-        test_dataset = torchvision.datasets.CIFAR10("./data", train=False, transform=test_transform, download=False)
+    loader_kwargs = dict(num_workers=num_workers, pin_memory=pin_memory, persistent_workers=num_workers > 0)
+    train_batch_transform, val_batch_transform = None, None
+    if config.get('dataset_cache', False):
+        # リサイズ済みの uint8 画像を1回だけ作ってメモリマップで読む．反転と正規化はデバイス上でバッチごとに行う
+        cache_dir = config.get('dataset_cache_dir', './data/cache')
+        train_dataset = CachedDataset(dataset_name, True, img_size, "./data", cache_dir, download=True)
+        test_dataset = CachedDataset(dataset_name, False, img_size, "./data", cache_dir, download=False)
+        train_batch_transform = BatchTransform(mean, std, flip=True)
+        val_batch_transform = BatchTransform(mean, std)
+        train_loader = batch_loader(train_dataset, batch_size, shuffle=True, drop_last=True, **loader_kwargs)
+        val_loader = batch_loader(test_dataset, batch_size, shuffle=False, drop_last=False, **loader_kwargs)
 
-    elif dataset_name == 'cifar100':
-        train_dataset = torchvision.datasets.CIFAR100("./data", train=True, transform=train_transform, download=True)
-        test_dataset = torchvision.datasets.CIFAR100("./data", train=False, transform=test_transform, download=False)
+    else:
+        if dataset_name == 'cifar10':
+            train_dataset = torchvision.datasets.CIFAR10("./data", train=True, transform=train_transform, download=True)
+            test_dataset = torchvision.datasets.CIFAR10("./data", train=False, transform=test_transform, download=False)
+
+        elif dataset_name == 'cifar100':
+            train_dataset = torchvision.datasets.CIFAR100("./data", train=True, transform=train_transform, download=True)
+            test_dataset = torchvision.datasets.CIFAR100("./data", train=False, transform=test_transform, download=False)
+
+        train_loader = torch.utils.data.DataLoader(train_dataset, batch_size=batch_size, 
+                                                shuffle=True, drop_last=True, **loader_kwargs)
+        val_loader = torch.utils.data.DataLoader(test_dataset, batch_size=batch_size, 
+                                                shuffle=False, drop_last=False, **loader_kwargs)
 
     class_names = train_dataset.classes        
     print('Class Names:', class_names)
     print('Number Of Class:', len(class_names))
 
-    train_loader = torch.utils.data.DataLoader(train_dataset, batch_size=batch_size, 
-                                            shuffle=True, num_workers=8, pin_memory=True, drop_last=True)
-    val_loader = torch.utils.data.DataLoader(test_dataset, batch_size=batch_size, 
-                                            shuffle=False, num_workers=8, pin_memory=True, drop_last=False)
-
     model = create_model("resnet18", pretrained=True, num_classes=len(class_names)) 
-    model.to('cuda')
+    model.to(device, memory_format=memory_format)
 
     optimizer = torch.optim.Adam(model.parameters(), lr=lr)
     criterion = torch.nn.CrossEntropyLoss()
-    scaler = torch.cuda.amp.GradScaler(enabled=True)
+    # 勾配スケーリングは float16 のときだけ必要 (bfloat16 では不要)
+    scaler = torch.amp.GradScaler(device.type, enabled=amp_dtype == torch.float16)
 
     print(model)
 
     # 学習対象のパラメータを可視化
     param_count = sum(p.numel() for p in model.parameters() if p.requires_grad)
     print(f'Total number of trainable parameters: {param_count}')
+    print(f'Device: {device}, AMP: {amp_dtype}, Threads: {torch.get_num_threads()}, Workers: {num_workers}')
 
+    # チェックポイントは別スレッドで書き出し，最新 ckpt_keep_last 件と ckpt_metric が良い ckpt_keep_best 件だけ残す
+    checkpoints = CheckpointWriter(
+        base_path + 'model/', keep_last=config.get('ckpt_keep_last', 3), keep_best=config.get('ckpt_keep_best', 1),
+        metric=config.get('ckpt_metric', 'Val Acc'), mode=config.get('ckpt_mode', 'max')
+    )
+    ckpt_interval = config.get('ckpt_interval', 1)
+    start_epoch = 0
+    best_val_acc = float('nan')
+    if resume:
+        # CPU に読み込む (RNG の状態は CPU のテンソルのまま戻す必要があり，重みは load_state_dict で移る)
+        ckpt = load_latest(base_path + 'model/', map_location='cpu')
+        if ckpt is not None:
+            model.load_state_dict(ckpt['model'])
+            optimizer.load_state_dict(ckpt['optimizer'])
+            if 'scaler' in ckpt:
+                scaler.load_state_dict(ckpt['scaler'])
+            if 'rng_state' in ckpt:
+                torch.set_rng_state(ckpt['rng_state'])
+            if ckpt.get('cuda_rng_state') is not None and device.type == 'cuda':
+                torch.cuda.set_rng_state_all(ckpt['cuda_rng_state'])
+            start_epoch = ckpt['epoch'] + 1
+            best_val_acc = ckpt.get('best_val_acc', best_val_acc)
+        print(f'Resume from epoch {start_epoch}')
+        # チェックポイントより後に書かれたログの行は学習し直すので消す
+        epoch_logger.trim('Epoch', start_epoch)
+        if train_logger is not None:
+            train_logger.trim('Iteration', start_epoch * len(train_loader))
+            val_logger.trim('Iteration', start_epoch * len(val_loader))
 
-    for epoch in range(num_epoch):
-        train_loss, train_count = trainer.train(device, train_loader, model, criterion, optimizer, scaler, epoch)
-        val_loss, val_count = trainer.validation(device, val_loader, model, criterion)
+    # 保存用に compile 前のモデルを残しておく
+    raw_model = model
+    if config.get('compile', False):
+        model = torch.compile(model)
 
-        print(f'Epoch [{epoch+1}/{num_epoch}], Trainig Loss: {train_loss/len(train_loader):.4f}')
-        print(f'Epoch [{epoch+1}/{num_epoch}], Validation Loss: {val_loss/len(val_loader):.4f} ')
-        print(f'Epoch [{epoch+1}/{num_epoch}], Trainig Acc: {train_count/len(train_loader.dataset):.4f}, Validation Acc: {val_count/len(val_loader.dataset):.4f} ')
 
-        # ログとモデルを保存
-        save_to_csv(
-            csv_file, epoch, 
-            train_loss/len(train_loader), train_count/len(train_loader.dataset), 
-            val_loss/len(val_loader), val_count/len(val_loader.dataset)
-        )
-        if (epoch+1) % 1 == 0:
-            print('saved!!')
-            save_model_path = base_path + 'model/' + str(epoch + 1) + '.tar'
-            torch.save({
-                    'model':model.state_dict(),
-                    'optimizer':optimizer.state_dict(),
-                    'epoch':epoch
-            }, save_model_path)
+    # 途中で例外が起きても配信の接続先ファイル (<csv>.stream) を残さないよう必ず閉じる
+    try:
+        for epoch in range(start_epoch, num_epoch):
+            train_loss, train_count = trainer.train(device, train_loader, model, criterion, optimizer, scaler, epoch, train_logger, log_interval, profiler,
+                                                    amp_dtype, memory_format, train_batch_transform)
+            val_loss, val_count = trainer.validation(device, val_loader, model, criterion, epoch, val_logger, log_interval,
+                                                     amp_dtype, memory_format, val_batch_transform)
+
+            print(f'Epoch [{epoch+1}/{num_epoch}], Trainig Loss: {train_loss/len(train_loader):.4f}')
+            print(f'Epoch [{epoch+1}/{num_epoch}], Validation Loss: {val_loss/len(val_loader):.4f} ')
+            print(f'Epoch [{epoch+1}/{num_epoch}], Trainig Acc: {train_count/len(train_loader.dataset):.4f}, Validation Acc: {val_count/len(val_loader.dataset):.4f} ')
+
+            # ログとモデルを保存
+            metrics = {
+                'Epoch': epoch,
+                'Train Loss': train_loss/len(train_loader), 'Train Acc': train_count/len(train_loader.dataset),
+                'Val Loss': val_loss/len(val_loader), 'Val Acc': val_count/len(val_loader.dataset),
+                **(profiler.summary() if profiler is not None else {}),
+            }
+            epoch_logger.log(metrics)
+            if not best_val_acc >= metrics['Val Acc']:
+                best_val_acc = metrics['Val Acc']
+            if (epoch+1) % ckpt_interval == 0 or epoch + 1 == num_epoch:
+                print('saved!!')
+                checkpoints.save(epoch, {
+                        'model':raw_model.state_dict(),
+                        'optimizer':optimizer.state_dict(),
+                        'scaler':scaler.state_dict(),
+                        'rng_state':torch.get_rng_state(),
+                        'cuda_rng_state':torch.cuda.get_rng_state_all() if device.type == 'cuda' else None,
+                        'best_val_acc':best_val_acc,
+                        'epoch':epoch
+                }, metrics)
+    finally:
+        for logger in (epoch_logger, train_logger, val_logger):
+            if logger is not None:
+                logger.close()
+        if profiler is not None:
+            profiler.close()
+        checkpoints.close()
+
+    # 最終エポックの値 (スイープの集計に使う)．再開時に学習済みだった場合はログの最終行
+    if start_epoch >= num_epoch:
+        metrics = read_last_row(csv_file)
+    return {'Output Dir': base_path, **metrics, 'Best Val Acc': best_val_acc}
 
 if __name__=='__main__':
 
     parser = argparse.ArgumentParser()
     parser.add_argument('--config_path', type=str, required=True, help="Path to config Python file")
+    parser.add_argument('--resume', type=str, default=None, help="Output directory of the run to resume (output/<timestamp>)")
+    parser.add_argument('--output_dir', type=str, default=None, help="Output directory (default: output/<timestamp>)")
 
     args = parser.parse_args()
     config = load_config(args.config_path)
 
-    main(args.config_path, config)
\ No newline at end of file
+    main(args.config_path, config, args.resume, args.output_dir)
\ No newline at end of file
@@ -12,44 +12,107 @@ import torchvision
 import torchvision.transforms as transforms
 from torchvision.transforms import ToPILImage
 
-def train(device, train_loader, model, criterion, optimizer, scaler, epoch):
+from contextlib import nullcontext
+
+from profiling import null_phase
+
+def autocast(device, amp_dtype):
+    # amp_dtype が None のときは混合精度を使わない
+    if amp_dtype is None:
+        return nullcontext()
+    return torch.autocast(device_type=device.type, dtype=amp_dtype)
+
+def log_steps(logger, steps, prefix):
+    # 溜めたステップの値を1回の転送でホストへ読み出してログに書く
+    if logger is None or not steps:
+        return
+    index = [i for i, _, _, _ in steps]
+    values = torch.stack([torch.stack([l for _, l, _, _ in steps]),
+                          torch.stack([c for _, _, c, _ in steps]).double()]).tolist()
+    for i, step_loss, step_count, (_, _, _, n) in zip(index, values[0], values[1], steps):
+        logger.log({
+            'Iteration': i,
+            f'{prefix} Loss': step_loss, f'{prefix} Acc': step_count / n
+        })
+    steps.clear()
+
+def train(device, train_loader, model, criterion, optimizer, scaler, epoch, logger=None, log_interval=50, profiler=None,
+          amp_dtype=torch.float16, memory_format=torch.contiguous_format, batch_transform=None):
     model.train()
-    sum_loss = 0.0
-    count = 0
+    # profiler を渡すとステップ内の各区間を計測する
+    phase = profiler.phase if profiler is not None else null_phase
+    if profiler is not None:
+        profiler.start_epoch()
+    # 損失と正解数はデバイス上で累積し，ホストへの同期は log_interval ステップごとかエポック終了時だけ
+    sum_loss = torch.zeros((), dtype=torch.float64, device=device)
+    count = torch.zeros((), dtype=torch.int64, device=device)
+    steps = []
 
     for idx, (img, label) in enumerate(tqdm(train_loader)):
-        img = img.to(device, non_blocking=True).float()
-        label = label.to(device, non_blocking=True).long()
+        if profiler is not None:
+            profiler.step_begin(epoch * len(train_loader) + idx)
+        with phase('h2d'):
+            img = img.to(device, non_blocking=True, memory_format=memory_format)
+            # 前処理キャッシュを使う場合は uint8 のまま転送してデバイス上で変換する
+            img = batch_transform(img) if batch_transform is not None else img.float()
+            label = label.to(device, non_blocking=True).long()
         
-        with torch.autocast(device_type="cuda", dtype=torch.float16):
-                logit = model(img)
-                loss = criterion(logit, label)
+        with phase('forward'):
+            with autocast(device, amp_dtype):
+                    logit = model(img)
+                    loss = criterion(logit, label)
             
-        optimizer.zero_grad()
-        scaler.scale(loss).backward()
-        scaler.step(optimizer)
-        scaler.update()
-        
-        sum_loss += loss.item()
-        count += torch.sum(logit.argmax(dim=1) == label).item()
+        with phase('backward'):
+            optimizer.zero_grad()
+            scaler.scale(loss).backward()
+        with phase('optimizer'):
+            scaler.step(optimizer)
+            scaler.update()
         
-    return sum_loss, count
+        step_loss = loss.detach().double()
+        step_count = torch.sum(logit.argmax(dim=1) == label)
+        sum_loss += step_loss
+        count += step_count
+
+        # イテレーションごとのログ
+        if logger is not None:
+            steps.append((epoch * len(train_loader) + idx, step_loss, step_count, label.size(0)))
+            if len(steps) >= log_interval:
+                log_steps(logger, steps, 'Train')
+        if profiler is not None:
+            profiler.step_end(label.size(0))
 
-def validation(device, val_loader, model, criterion):
+    log_steps(logger, steps, 'Train')
+    if profiler is not None:
+        profiler.end_epoch()
+    return sum_loss.item(), count.item()
+
+def validation(device, val_loader, model, criterion, epoch=0, logger=None, log_interval=50,
+               amp_dtype=torch.float16, memory_format=torch.contiguous_format, batch_transform=None):
     model.eval()
-    sum_loss = 0.0
-    count = 0
+    sum_loss = torch.zeros((), dtype=torch.float64, device=device)
+    count = torch.zeros((), dtype=torch.int64, device=device)
+    steps = []
 
     with torch.no_grad():
         for idx, (img, label) in enumerate(tqdm(val_loader)):
-            img = img.to(device, non_blocking=True).float()
+            img = img.to(device, non_blocking=True, memory_format=memory_format)
+            img = batch_transform(img) if batch_transform is not None else img.float()
             label = label.to(device, non_blocking=True).long()
             
-            with torch.autocast(device_type="cuda", dtype=torch.float16):
+            with autocast(device, amp_dtype):
                 logit = model(img)
                 loss = criterion(logit, label)
 
-            sum_loss += loss.item()
-            count += torch.sum(logit.argmax(dim=1) == label).item()
+            step_loss = loss.double()
+            step_count = torch.sum(logit.argmax(dim=1) == label)
+            sum_loss += step_loss
+            count += step_count
+
+            if logger is not None:
+                steps.append((epoch * len(val_loader) + idx, step_loss, step_count, label.size(0)))
+                if len(steps) >= log_interval:
+                    log_steps(logger, steps, 'Val')
 
-    return sum_loss, count
\ No newline at end of file
+    log_steps(logger, steps, 'Val')
+    return sum_loss.item(), count.item()